@@ -10,14 +10,19 @@ class Api:
         # load_dotenv()
         self._app = app_instance
         self.__controller = MainController(app_instance)
+        self.__max_identity_bytes = int(os.getenv("IDENTITY_UPLOAD_MAX_BYTES", str(8 * 1024 * 1024)))
         
         # Enable CORS for all routes
         CORS(self._app, origins=["http://localhost:3000", "https://*.ngrok-free.app"], 
              supports_credentials=True)
 
         self.__setup_routes()
+        self._app.register_error_handler(413, self._request_too_large)
 
     def __setup_routes(self):
+        self._app.add_url_rule('/api/health', view_func=self._health, methods=['GET'])
+        self._app.add_url_rule('/api/health/ready', view_func=self._health_ready, methods=['GET'])
+
         self._app.add_url_rule('/get/user', view_func=self._get_user, methods=['GET'])
         self._app.add_url_rule('/get/user/<id_user>', view_func=self._get_user_by_id, methods=['GET'])
         self._app.add_url_rule('/api/login', view_func=self._login, methods=['POST'])
@@ -44,6 +49,16 @@ class Api:
         self._app.add_url_rule('/api/get/order/user/<id_user>', view_func=self._get_order_by_id_user, methods=['GET'])
         self._app.add_url_rule('/api/get/order/code/nik/<order_code>/<nik>', view_func=self._get_order_by_code_and_nik, methods=['GET'])
 
+    def _health(self):
+        data = self.__controller.get_detection_status()
+        return jsonify({"status": "ok", "detection": data}), 200
+
+    def _health_ready(self):
+        data = self.__controller.get_detection_status()
+        if data['ready']:
+            return jsonify({"status": "ready", "detection": data}), 200
+        return jsonify({"status": "loading", "detection": data}), 503
+
     def _get_user(self):
         data = self.__controller.get_user()
         return jsonify({"status": "Data received", "data": data}), 200
@@ -169,15 +184,29 @@ class Api:
 
     
     def _send_identity(self, option):
+        # tolak sebelum body dibaca bila Content-Length sudah melebihi batas
+        if request.content_length is not None and request.content_length > self.__max_identity_bytes:
+            return self._request_too_large(None)
+
         if 'file' not in request.files:
             return jsonify({"error": "No file uploaded"}), 400
 
-        file = request.files['file']
+        # werkzeug sudah menampung upload di SpooledTemporaryFile, jadi stream-nya
+        # diteruskan apa adanya tanpa file.read() ke memori
+        stream = request.files['file'].stream
+        stream.seek(0, os.SEEK_END)
+        size = stream.tell()
+        stream.seek(0)
+        if size > self.__max_identity_bytes:
+            return self._request_too_large(None)
 
-        data = self.__controller.detect(file.read(), option)
+        data = self.__controller.detect(stream, option)
         print(data)
         return jsonify({"status": "Data received", "data": data}), 200
 
+    def _request_too_large(self, error):
+        return jsonify({"error": "File too large"}), 413
+
     def _get_user_profile(self):
         # try:
             session_id = request.cookies.get("session_id")
@@ -0,0 +1,178 @@
+# Benchmark pipeline deteksi KTP/KK: latensi p50/p95/p99 per tahap dan images/sec.
+# Jalankan dari folder backend, contoh:
+#   python -m benchmark.detection_benchmark --images samples/ --option both --concurrency 1,4,8
+#   python -m benchmark.detection_benchmark --synthetic 16 --option ktp --batching
+# Folder gambar boleh berisi subfolder ktp/ dan kk/; bila tidak, semua gambar dipakai untuk tiap opsi.
+import argparse
+import glob
+import io
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageOps
+
+from controller.detection_controller import DetectionController
+from controller.inference_controller import InferenceController
+from model.detection_model import DetectionModel
+
+STAGES = ['decode', 'inference', 'crop', 'ocr', 'postprocess']
+EXTENSIONS = ('*.jpg', '*.jpeg', '*.png', '*.webp')
+
+class StageProfiler:
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.__samples = {}
+
+    def record(self, stage, seconds):
+        with self.__lock:
+            self.__samples.setdefault(stage, []).append(seconds)
+
+    def reset(self):
+        with self.__lock:
+            self.__samples = {}
+
+    def get_samples(self):
+        with self.__lock:
+            return {stage: list(values) for stage, values in self.__samples.items()}
+
+
+def percentiles(values):
+    if not values:
+        return None
+    arr = np.asarray(values) * 1000.0
+    p50, p95, p99 = np.percentile(arr, [50, 95, 99])
+    return {"count": len(values), "p50_ms": float(p50), "p95_ms": float(p95), "p99_ms": float(p99), "mean_ms": float(arr.mean())}
+
+
+def synthetic_images(count, size=(4000, 3000), seed=0):
+    # foto "kartu" sintetis seukuran kamera ponsel 12MP; tidak akan berisi deteksi
+    # yang valid, tapi cukup untuk mengukur decode dan inferensi
+    rng = np.random.default_rng(seed)
+    images = []
+    for i in range(count):
+        noise = rng.integers(150, 255, size=(size[1] // 8, size[0] // 8, 3), dtype=np.uint8)
+        image = Image.fromarray(noise).resize(size)
+        draw = ImageDraw.Draw(image)
+        for line in range(12):
+            y = 300 + line * 200
+            draw.text((400, y), f"NIK : 3578{rng.integers(10**11, 10**12)}", fill=(20, 20, 20))
+        buffer = io.BytesIO()
+        image.save(buffer, format='JPEG', quality=90)
+        images.append((f"synthetic_{i}.jpg", buffer.getvalue()))
+    return images
+
+
+def load_images(directory, option):
+    folder = os.path.join(directory, option)
+    if not os.path.isdir(folder):
+        folder = directory
+
+    paths = []
+    for pattern in EXTENSIONS:
+        paths += glob.glob(os.path.join(folder, pattern))
+
+    images = []
+    for path in sorted(paths):
+        with open(path, 'rb') as f:
+            images.append((os.path.basename(path), f.read()))
+    return images
+
+
+def run(controller, profiler, images, option, concurrency, iterations):
+    jobs = [image for _ in range(iterations) for _, image in images]
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+
+    def task(image):
+        nonlocal errors
+        start = time.perf_counter()
+        try:
+            controller.detect(image, option)
+        except Exception:
+            with lock:
+                errors += 1
+        with lock:
+            latencies.append(time.perf_counter() - start)
+
+    profiler.reset()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(task, jobs))
+    elapsed = time.perf_counter() - start
+
+    samples = profiler.get_samples()
+    return {
+        "option": option,
+        "concurrency": concurrency,
+        "images": len(jobs),
+        "errors": errors,
+        "images_per_sec": len(jobs) / elapsed if elapsed else 0.0,
+        "total": percentiles(latencies),
+        "stages": {stage: percentiles(samples.get(stage, [])) for stage in STAGES},
+    }
+
+
+def print_report(report):
+    print(f"\n[{report['option']}] concurrency={report['concurrency']} images={report['images']} "
+          f"errors={report['errors']} throughput={report['images_per_sec']:.2f} img/s")
+    print(f"  {'stage':<12}{'count':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for stage, stats in [*report['stages'].items(), ('total', report['total'])]:
+        if stats is None:
+            print(f"  {stage:<12}{'-':>7}")
+            continue
+        print(f"  {stage:<12}{stats['count']:>7}{stats['p50_ms']:>10.1f}{stats['p95_ms']:>10.1f}{stats['p99_ms']:>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark KTP/KK detection pipeline")
+    parser.add_argument("--images", help="folder gambar contoh (opsional subfolder ktp/ dan kk/)")
+    parser.add_argument("--synthetic", type=int, default=0, help="jumlah gambar sintetis bila --images tidak diisi")
+    parser.add_argument("--option", choices=['ktp', 'kk', 'both'], default='both')
+    parser.add_argument("--concurrency", default="1", help="daftar level konkurensi, mis. 1,4,8")
+    parser.add_argument("--iterations", type=int, default=3)
+    parser.add_argument("--batching", action='store_true', help="lewatkan inferensi melalui InferenceController")
+    parser.add_argument("--json", help="simpan hasil ke berkas JSON")
+    args = parser.parse_args()
+
+    if not args.images and args.synthetic <= 0:
+        parser.error("isi --images atau --synthetic")
+
+    detection_model = DetectionModel()
+    detection_model.warm_up(background=False)
+    inference = InferenceController(detection_model.get_model, detection_model.get_options()) if args.batching else None
+    profiler = StageProfiler()
+    controller = DetectionController(np, Image, ImageOps, re, io, detection_model, inference, profiler=profiler)
+
+    options = ['ktp', 'kk'] if args.option == 'both' else [args.option]
+    levels = [int(level) for level in args.concurrency.split(",")]
+
+    reports = []
+    for option in options:
+        images = load_images(args.images, option) if args.images else synthetic_images(args.synthetic)
+        if not images:
+            print(f"[{option}] tidak ada gambar, dilewati")
+            continue
+
+        # pemanasan: muat bobot & alokasi pertama tidak ikut diukur
+        controller.detect(images[0][1], option)
+        for level in levels:
+            report = run(controller, profiler, images, option, level, args.iterations)
+            print_report(report)
+            reports.append(report)
+
+    if inference is not None:
+        inference.shutdown()
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({"backend": detection_model.get_backend(), "reports": reports}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
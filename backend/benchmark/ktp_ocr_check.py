@@ -0,0 +1,89 @@
+# Perbandingan OCR field KTP: jalur lama (readtext per crop) vs recognize satu pass.
+# Mencetak hasil kedua mode per gambar (beda hasil & label yang bocor ditandai) dan latensi tahap OCR.
+# Jalankan dari folder backend dengan foto KTP asli, contoh:
+#   python -m benchmark.ktp_ocr_check --images samples/ktp --iterations 5
+import argparse
+import io
+import json
+import re
+
+import numpy as np
+from PIL import Image, ImageOps
+
+from benchmark.detection_benchmark import StageProfiler, load_images, percentiles
+from controller.detection_controller import DetectionController
+from model.detection_model import DetectionModel
+
+MODES = ['readtext', 'recognize']
+FIELDS = ['name', 'nik', 'gender']
+LABEL_RE = re.compile(r'^(NAMA|NIK|JENIS\s*KELAMIN|KELAMIN|JK)(?![A-Z])|:')
+
+
+def decode(image_bytes):
+    image = Image.open(io.BytesIO(image_bytes))
+    ImageOps.exif_transpose(image, in_place=True)
+    return np.array(image.convert('RGB'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bandingkan OCR field KTP: readtext vs recognize")
+    parser.add_argument("--images", required=True, help="folder foto KTP (atau folder dengan subfolder ktp/)")
+    parser.add_argument("--iterations", type=int, default=3)
+    parser.add_argument("--json", help="simpan hasil ke berkas JSON")
+    args = parser.parse_args()
+
+    images = load_images(args.images, 'ktp')
+    if not images:
+        parser.error("tidak ada gambar KTP di folder tersebut")
+
+    detection_model = DetectionModel()
+    detection_model.warm_up(background=False)
+    print(f"OCR device: {getattr(detection_model.get_reader(), 'device', 'unknown')}")
+
+    profilers = {mode: StageProfiler() for mode in MODES}
+    controllers = {
+        mode: DetectionController(np, Image, ImageOps, re, io, detection_model, profiler=profilers[mode], ktp_ocr=mode)
+        for mode in MODES
+    }
+
+    rows = []
+    for name, image_bytes in images:
+        img_np = decode(image_bytes)
+        results = {mode: controllers[mode].detect_array(img_np, 'ktp') for mode in MODES}
+        leaked = [field for field in FIELDS if LABEL_RE.search(results['recognize'].get(field) or '')]
+        differs = [field for field in FIELDS if results['readtext'].get(field) != results['recognize'].get(field)]
+        rows.append({"image": name, "results": results, "differs": differs, "label_leak": leaked})
+
+        print(f"\n{name}")
+        for field in FIELDS:
+            mark = " *" if field in differs else ""
+            mark += " LABEL" if field in leaked else ""
+            print(f"  {field:<7} readtext={results['readtext'].get(field)!r:<28} "
+                  f"recognize={results['recognize'].get(field)!r}{mark}")
+
+    # latensi tahap OCR saja (inferensi YOLO sama untuk kedua mode)
+    for profiler in profilers.values():
+        profiler.reset()
+    for _ in range(args.iterations):
+        for _, image_bytes in images:
+            img_np = decode(image_bytes)
+            for mode in MODES:
+                controllers[mode].detect_array(img_np, 'ktp')
+
+    stats = {mode: percentiles(profilers[mode].get_samples().get('ocr', [])) for mode in MODES}
+    print(f"\n  {'mode':<12}{'count':>7}{'p50 ms':>10}{'p95 ms':>10}")
+    for mode, s in stats.items():
+        if s is not None:
+            print(f"  {mode:<12}{s['count']:>7}{s['p50_ms']:>10.1f}{s['p95_ms']:>10.1f}")
+    if stats['readtext'] and stats['recognize']:
+        print(f"  speedup p50: {stats['readtext']['p50_ms'] / stats['recognize']['p50_ms']:.2f}x")
+    print(f"  gambar dengan hasil berbeda: {sum(1 for r in rows if r['differs'])}/{len(rows)}, "
+          f"label bocor: {sum(1 for r in rows if r['label_leak'])}/{len(rows)}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({"ocr": stats, "images": rows}, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+# Benchmark panggilan LLM: httpx.AsyncClient baru per request vs client bersama (rag.core.http_client).
+# Tanpa --url, server pengganti lokal (OpenAI-compatible, HTTP/1.1 keep-alive) dijalankan otomatis.
+# Jalankan dari folder backend, contoh:
+#   python -m benchmark.llm_client_benchmark --requests 500 --concurrency 1,16 --latency-ms 20
+#   python -m benchmark.llm_client_benchmark --url https://staging.example/v1/chat/completions
+import argparse
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import numpy as np
+
+from rag.core.http_client import create_client
+
+COMPLETION = json.dumps({
+    "id": "chatcmpl-bench",
+    "object": "chat.completion",
+    "model": "stand-in",
+    "choices": [{"index": 0, "message": {"role": "assistant", "content": "Halo, ada yang bisa dibantu?"}, "finish_reason": "stop"}],
+}).encode("utf-8")
+
+
+def start_stand_in(latency_ms):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"   # keep-alive, seperti upstream sungguhan
+        disable_nagle_algorithm = True  # header & body ditulis terpisah; tanpa ini ada jeda ~40 ms (delayed ACK)
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            if latency_ms:
+                time.sleep(latency_ms / 1000.0)
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(COMPLETION)))
+            self.end_headers()
+            self.wfile.write(COMPLETION)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}/v1/chat/completions"
+
+
+async def run(mode, url, total, concurrency):
+    payload = {"model": "stand-in", "messages": [{"role": "user", "content": "jadwal kereta"}]}
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+    shared = create_client(http2=False) if mode == "shared" else None
+
+    async def call():
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                if shared is not None:
+                    r = await shared.post(url, json=payload)
+                else:
+                    # perilaku lama: handshake baru setiap request
+                    async with httpx.AsyncClient(timeout=60) as client:
+                        r = await client.post(url, json=payload)
+                r.raise_for_status()
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[call() for _ in range(total)])
+    elapsed = time.perf_counter() - start
+    if shared is not None:
+        await shared.aclose()
+
+    arr = np.asarray(latencies) * 1000.0
+    p50, p95, p99 = np.percentile(arr, [50, 95, 99])
+    return {
+        "mode": mode, "concurrency": concurrency, "requests": total, "errors": errors,
+        "p50_ms": float(p50), "p95_ms": float(p95), "p99_ms": float(p99), "rps": total / elapsed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark per-request vs shared LLM HTTP client")
+    parser.add_argument("--url", help="endpoint chat/completions; kosong = server pengganti lokal")
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--concurrency", default="1,16", help="daftar level konkurensi, mis. 1,16")
+    parser.add_argument("--latency-ms", type=float, default=10.0, help="latensi simulasi server pengganti")
+    parser.add_argument("--json", help="simpan hasil ke berkas JSON")
+    args = parser.parse_args()
+
+    server = None
+    url = args.url
+    if not url:
+        server, url = start_stand_in(args.latency_ms)
+
+    rows = []
+    for level in [int(x) for x in args.concurrency.split(",")]:
+        for mode in ("per-request", "shared"):
+            asyncio.run(run(mode, url, min(20, args.requests), level))   # pemanasan
+            rows.append(asyncio.run(run(mode, url, args.requests, level)))
+
+    print(f"{'mode':<14}{'conc':>6}{'errors':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'req/s':>9}")
+    for r in rows:
+        print(f"{r['mode']:<14}{r['concurrency']:>6}{r['errors']:>8}{r['p50_ms']:>9.2f}{r['p95_ms']:>9.2f}{r['p99_ms']:>9.2f}{r['rps']:>9.1f}")
+
+    if server is not None:
+        server.shutdown()
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
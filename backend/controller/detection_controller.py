@@ -1,59 +1,166 @@
+import contextlib
+import hashlib
+import os
+import time
+
 class DetectionController:
-    def __init__(self, np, Image, re, io, reader,model_ktp, model_kk):
+    def __init__(self, np, Image, ImageOps, re, io, detection_model, inference=None, worker_pool=None, cache=None, profiler=None, ktp_ocr=None):
         self.__np = np
         self.__Image = Image
+        self.__ImageOps = ImageOps
         self.__re = re
         self.__io = io
-        self.__reader = reader
-        self.__model_ktp = model_ktp
-        self.__model_kk = model_kk
+        self.__detection_model = detection_model
+        self.__inference = inference
+        self.__worker_pool = worker_pool
+        self.__cache = cache
+        self.__profiler = profiler
+        # recognize: satu pass recognizer tanpa CRAFT; readtext: jalur lama per crop (untuk perbandingan)
+        self.__ktp_ocr = ktp_ocr or os.getenv("KTP_OCR_MODE", "recognize")
+        self.__crop_max_side = int(os.getenv("DETECTION_CROP_MAX_SIDE", "1600"))
+        self.__input_max_side = int(os.getenv("DETECTION_INPUT_MAX_SIDE", "640"))
+
+    def get_status(self):
+        if self.__worker_pool is not None:
+            status = self.__worker_pool.get_status()
+        else:
+            status = self.__detection_model.get_status()
+        if self.__cache is not None:
+            status["cache"] = self.__cache.get_stats()
+        return status
 
     def detect(self, image_file, option):
-        image = self.__Image.open(self.__io.BytesIO(image_file))
-        img_np = self.__np.array(image)  
+        if self.__cache is None:
+            return self.__detect(image_file, option)
+
+        key = self.__cache_key(image_file, option)
+        data = self.__cache.get(key)
+        if data is not None:
+            return data
+
+        data = self.__detect(image_file, option)
+        if not (isinstance(data, dict) and 'error' in data):
+            self.__cache.set(key, data)
+        return data
+
+    def __detect(self, image_file, option):
+        with self.__stage('decode'):
+            image = self.__decode(image_file)
+            img_np = self.__np.array(image) if self.__worker_pool is None else None
+        if self.__worker_pool is not None:
+            return self.__worker_pool.detect(image, option)
+
+        return self.detect_array(img_np, option)
+
+    def __cache_key(self, image_file, option):
+        digest = hashlib.sha256()
+        if isinstance(image_file, (bytes, bytearray)):
+            digest.update(image_file)
+        else:
+            # hash per potongan agar upload yang di-spool tidak dibaca utuh ke memori
+            position = image_file.tell()
+            for chunk in iter(lambda: image_file.read(1024 * 1024), b''):
+                digest.update(chunk)
+            image_file.seek(position)
+        return f"{option}:{self.__detection_model.get_version(option)}:{digest.hexdigest()}"
+
+    def detect_array(self, img_np, option):
+        with self.__stage('inference'):
+            image, scale = self.__prepare_input(img_np)
+            results = self.__predict(image, option)
         if option == 'ktp':
-            results = self.__model_ktp(image, verbose=False)
-            data = self.__find_box_name_and_nik_ktp(results, img_np)
+            data = self.__find_box_name_and_nik_ktp(results, img_np, scale)
         elif option == 'kk':
-            results = self.__model_kk(image, verbose=False)
-            data = self.__find_box_name_and_nik_kk(results, img_np)
+            data = self.__find_box_name_and_nik_kk(results, img_np, scale)
         return data
-    
-    def __find_box_name_and_nik_ktp(self, results, image):
-        bbox_nama = None
-        bbox_nik = None
-        bbox_jenis_kelamin = None
 
+    @contextlib.contextmanager
+    def __stage(self, name):
+        # catat durasi tiap tahap pipeline bila profiler dipasang (lihat benchmark/)
+        if self.__profiler is None:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.__profiler.record(name, time.perf_counter() - start)
+
+    def __decode(self, image_file):
+        # image_file bisa berupa bytes atau file-like (upload yang di-spool)
+        source = image_file if hasattr(image_file, 'read') else self.__io.BytesIO(image_file)
+        image = self.__Image.open(source)
+        # untuk JPEG, decode langsung di resolusi yang lebih kecil (DCT scaling);
+        # ukuran target harus mengikuti rasio gambar agar draft mau memperkecil
+        ratio = self.__crop_max_side / max(image.size)
+        if ratio < 1.0:
+            image.draft('RGB', (int(image.size[0] * ratio), int(image.size[1] * ratio)))
+        self.__ImageOps.exif_transpose(image, in_place=True)
+        image = image.convert('RGB')
+        if max(image.size) > self.__crop_max_side:
+            image.thumbnail((self.__crop_max_side, self.__crop_max_side))
+        return image
+
+    def __prepare_input(self, img_np):
+        height, width = img_np.shape[:2]
+        scale = min(1.0, self.__input_max_side / max(height, width))
+        if scale < 1.0:
+            size = (max(1, round(width * scale)), max(1, round(height * scale)))
+            resized = self.__Image.fromarray(img_np).resize(size, self.__Image.BILINEAR, reducing_gap=3.0)
+            img_np = self.__np.asarray(resized)
+
+        # YOLO memperlakukan array numpy sebagai BGR, sedangkan img_np berformat RGB
+        return self.__np.ascontiguousarray(img_np[..., ::-1]), scale
+
+    def __iter_boxes(self, results, scale):
+        # kembalikan kotak ke koordinat gambar sumber crop
         for r in results:
             class_names = r.names
             for box in r.boxes:
-                class_id = box.cls
-                class_name = class_names[int(class_id)]
-                x1, y1, x2, y2 = box.xyxy[0].cpu().numpy().astype(int)
+                class_name = class_names[int(box.cls)]
+                xyxy = box.xyxy[0]
+                if hasattr(xyxy, 'cpu'):
+                    xyxy = xyxy.cpu().numpy()
+                x1, y1, x2, y2 = (xyxy / scale).astype(int)
+                yield class_name, (x1, y1, x2, y2)
 
+    def __predict(self, image, option):
+        if self.__inference is not None:
+            return self.__inference.predict(image, option)
+        return self.__detection_model.get_model(option)(image, verbose=False)
+    
+    def __find_box_name_and_nik_ktp(self, results, image, scale=1.0):
+        bbox_nama = None
+        bbox_nik = None
+        bbox_jenis_kelamin = None
+
+        with self.__stage('crop'):
+            for class_name, bbox in self.__iter_boxes(results, scale):
                 if class_name == 'NAMA' and bbox_nama is None:
-                    bbox_nama = (x1, y1, x2, y2)
+                    bbox_nama = bbox
                 elif class_name == 'NIK' and bbox_nik is None:
-                    bbox_nik = (x1, y1, x2, y2)
+                    bbox_nik = bbox
                 elif class_name == 'JK' and bbox_jenis_kelamin is None:
-                    bbox_jenis_kelamin = (x1, y1, x2, y2)
+                    bbox_jenis_kelamin = bbox
 
         if bbox_nama is not None and bbox_nik is not None:
+            boxes = [bbox_nama, bbox_nik]
+            if bbox_jenis_kelamin is not None:
+                boxes.append(bbox_jenis_kelamin)
 
-            cropped_area_name = image[bbox_nama[1]:bbox_nama[3], bbox_nama[0]:bbox_nama[2]]
-            cropped_area_nik = image[bbox_nik[1]:bbox_nik[3], bbox_nik[0]:bbox_nik[2]]
-            cropped_area_jenis_kelamin = image[bbox_jenis_kelamin[1]:bbox_jenis_kelamin[3], bbox_jenis_kelamin[0]:bbox_jenis_kelamin[2]]    
+            texts = self.__ocr_boxes_ktp(image, boxes)
 
-            ocr_nama = self.__ocr_image_ktp(cropped_area_name)
-            ocr_nik = self.__ocr_image_ktp(cropped_area_nik)
-            ocr_jenis_kelamin = self.__ocr_image_ktp(cropped_area_jenis_kelamin)
+            with self.__stage('postprocess'):
+                ocr_nama = texts[0]
+                ocr_nik = texts[1]
+                ocr_jenis_kelamin = texts[2] if len(texts) > 2 else ''
 
-            if self.__re.match(('L\w*'), ocr_jenis_kelamin, self.__re.IGNORECASE):
-                ocr_jenis_kelamin = 'LAKI-LAKI'
-            elif self.__re.match(('P\w*'), ocr_jenis_kelamin, self.__re.IGNORECASE):
-                ocr_jenis_kelamin = 'PEREMPUAN'
-            else:
-                ocr_jenis_kelamin = None
+                if self.__re.match(('L\w*'), ocr_jenis_kelamin, self.__re.IGNORECASE):
+                    ocr_jenis_kelamin = 'LAKI-LAKI'
+                elif self.__re.match(('P\w*'), ocr_jenis_kelamin, self.__re.IGNORECASE):
+                    ocr_jenis_kelamin = 'PEREMPUAN'
+                else:
+                    ocr_jenis_kelamin = None
 
             return {
                 "name": ocr_nama,
@@ -63,31 +170,70 @@ class DetectionController:
         else:
             return {"error": "Could not find both 'nama' and 'nik' in the image."}
         
-    def __ocr_image_ktp(self, cropped_area):
-        result = self.__reader.readtext(cropped_area)
-        
-        cleaned_result = ''
+    def __ocr_boxes_ktp(self, image, boxes):
+        if self.__ktp_ocr == 'readtext':
+            return self.__readtext_boxes_ktp(image, boxes)
+
+        # Kotak sudah diketahui dari YOLO, jadi cukup jalankan recognizer EasyOCR
+        # tanpa tahap deteksi teks (CRAFT). Di GPU semua crop masuk satu batch;
+        # di CPU EasyOCR tetap mengenali crop satu per satu, yang dihemat hanya CRAFT per crop.
+        height, width = image.shape[:2]
+        horizontal_list = []
+        for x1, y1, x2, y2 in boxes:
+            horizontal_list.append([max(0, int(x1)), min(width, int(x2)), max(0, int(y1)), min(height, int(y2))])
+
+        with self.__stage('ocr'):
+            result = self.__detection_model.get_reader().recognize(
+                image,
+                horizontal_list=horizontal_list,
+                free_list=[],
+                batch_size=len(horizontal_list),
+                detail=1
+            )
+
+        # recognize mengurutkan hasil berdasarkan posisi vertikal,
+        # jadi petakan kembali ke kotak asal lewat koordinat kiri-atas
+        texts = [None] * len(horizontal_list)
         for bbox, text, conf in result:
-            cleaned_result = text.strip().upper()
+            x_min, y_min = int(bbox[0][0]), int(bbox[0][1])
+            for i, (bx1, bx2, by1, by2) in enumerate(horizontal_list):
+                if texts[i] is None and bx1 == x_min and by1 == y_min:
+                    texts[i] = self.__strip_label(text.strip().upper())
+                    break
+
+        return [text or '' for text in texts]
 
-        return cleaned_result
+    def __readtext_boxes_ktp(self, image, boxes):
+        # jalur lama: readtext (CRAFT + recognizer) per crop, ambil segmen teks terakhir
+        reader = self.__detection_model.get_reader()
+        texts = []
+        with self.__stage('ocr'):
+            for x1, y1, x2, y2 in boxes:
+                cleaned_result = ''
+                for bbox, text, conf in reader.readtext(image[max(0, y1):y2, max(0, x1):x2]):
+                    cleaned_result = text.strip().upper()
+                texts.append(cleaned_result)
+        return texts
+
+    def __strip_label(self, text):
+        # recognize membaca seluruh crop sebagai satu teks ("NIK : 3578..."), sedangkan readtext
+        # memisahkan label dan isinya; buang label di depan supaya hasilnya setara
+        text = self.__re.sub(r'^(NAMA|NIK|JENIS\s*KELAMIN|KELAMIN|JK)(?![A-Z])\s*[:;.]*\s*', '', text)
+        if ':' in text:
+            text = text.rsplit(':', 1)[1]
+        return text.strip()
      
 
-    def __find_box_name_and_nik_kk(self, results, image):
+    def __find_box_name_and_nik_kk(self, results, image, scale=1.0):
         bbox_nama_lengkap = None
         bbox_jenis_kelamin = None
 
-        for r in results:
-            class_names = r.names
-            for box in r.boxes:
-                class_id = box.cls
-                class_name = class_names[int(class_id)]
-                x1, y1, x2, y2 = box.xyxy[0].cpu().numpy().astype(int)
-
+        with self.__stage('crop'):
+            for class_name, bbox in self.__iter_boxes(results, scale):
                 if class_name == 'nama_lengkap':
-                    bbox_nama_lengkap = (x1, y1, x2, y2)
+                    bbox_nama_lengkap = bbox
                 elif class_name == 'jenis_kelamin':
-                    bbox_jenis_kelamin = (x1, y1, x2, y2)
+                    bbox_jenis_kelamin = bbox
 
         if bbox_nama_lengkap is not None and bbox_jenis_kelamin is not None:
             x_start_combined = min(bbox_nama_lengkap[0], bbox_jenis_kelamin[0])
@@ -102,38 +248,72 @@ class DetectionController:
 
             cropped_area_original = image[y_start_combined:y_end_combined, 
                                                 x_start_combined:x_end_combined]
-            return self.__get_name_and_nik_kk(cropped_area_original)
+            # batas kolom relatif terhadap crop: nama | NIK | jenis kelamin
+            name_right = bbox_nama_lengkap[2] - x_start_combined
+            gender_left = bbox_jenis_kelamin[0] - x_start_combined
+            return self.__get_name_and_nik_kk(cropped_area_original, name_right, gender_left)
         else:
             return {"error": "Could not find both 'nama_lengkap' and 'nik' in the image."}
 
      
-    def __get_name_and_nik_kk(self, cropped_area_original):
-        num_row = 0
-        data = []
-        
-        ocr_results = self.__reader.readtext(cropped_area_original)
+    def __get_name_and_nik_kk(self, cropped_area_original, name_right, gender_left):
+        with self.__stage('ocr'):
+            ocr_results = self.__detection_model.get_reader().readtext(cropped_area_original)
+
+        with self.__stage('postprocess'):
+            return self.__parse_kk_rows(ocr_results, name_right, gender_left)
+
+    def __parse_kk_rows(self, ocr_results, name_right, gender_left):
+        np = self.__np
         pola = r"(NAMA(?:\s\w+)*|NIK\w*|JENIS\w*|KELAMIN\w*|\(|\)|\(\d*\))"
-            
-        temp = {}  
-        for (bbox, text, prob) in ocr_results:
-            if self.__re.match(pola, text, self.__re.IGNORECASE) or text in ('1', '2', '3'):
+
+        tokens = [
+            (bbox, text.strip())
+            for bbox, text, prob in ocr_results
+            if text.strip() and not (self.__re.match(pola, text, self.__re.IGNORECASE) or text in ('1', '2', '3'))
+        ]
+        if not tokens:
+            return []
+
+        boxes = np.array([bbox for bbox, _ in tokens], dtype=np.float32)    # (n, 4, 2)
+        texts = [text for _, text in tokens]
+        x_center = boxes[:, :, 0].mean(axis=1)
+        y_center = boxes[:, :, 1].mean(axis=1)
+        heights = boxes[:, :, 1].max(axis=1) - boxes[:, :, 1].min(axis=1)
+
+        # baris tabel: urutkan berdasarkan y, baris baru dimulai saat jarak antar
+        # pusat kotak melebihi setengah tinggi teks
+        order = np.argsort(y_center, kind='stable')
+        gaps = np.diff(y_center[order])
+        threshold = max(float(np.median(heights)) * 0.5, 1.0)
+        row_ids = np.empty(len(tokens), dtype=int)
+        row_ids[order] = np.concatenate([[0], np.cumsum(gaps > threshold)])
+
+        # kolom: berdasarkan posisi x terhadap kotak YOLO, dengan cadangan pola digit
+        # untuk NIK bila kolom nama/jenis kelamin saling tumpang tindih
+        is_digits = np.array([len(self.__re.sub(r"\D", "", text)) >= 8 for text in texts])
+        column = np.where(x_center >= gender_left, 2, np.where(x_center <= name_right, 0, 1))
+        if gender_left <= name_right:
+            column = np.where(is_digits, 1, column)
+
+        data = []
+        for row in np.unique(row_ids):
+            members = np.flatnonzero(row_ids == row)
+            members = members[np.argsort(x_center[members], kind='stable')]
+
+            name = " ".join(texts[i] for i in members if column[i] == 0).upper()
+            nik = "".join(texts[i] for i in members if column[i] == 1).replace(" ", "")
+            gender = " ".join(texts[i] for i in members if column[i] == 2).upper()
+            if not name and not nik:
                 continue
 
-            if num_row % 3 == 0:
-                temp['name'] = text.strip().upper()
-            elif num_row % 3 == 1:
-                temp['nik'] = text.replace(" ", "").strip()
-            elif num_row % 3 == 2:
-                gender = text.strip().upper()
-                if self.__re.match(('L\w*'), gender, self.__re.IGNORECASE):
-                    temp['gender'] = 'LAKI-LAKI'
-                elif self.__re.match(('P\w*'), gender, self.__re.IGNORECASE):
-                    temp['gender'] = 'PEREMPUAN'
-                else:
-                    temp['gender'] = None
-                data.append(temp)  
-                temp = {} 
+            if self.__re.match(('L\w*'), gender, self.__re.IGNORECASE):
+                gender = 'LAKI-LAKI'
+            elif self.__re.match(('P\w*'), gender, self.__re.IGNORECASE):
+                gender = 'PEREMPUAN'
+            else:
+                gender = None
 
-            num_row += 1
+            data.append({"name": name, "nik": nik, "gender": gender})
 
         return data
@@ -0,0 +1,85 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+class InferenceController:
+    def __init__(self, get_model, options, max_batch_size=None, max_wait_ms=None):
+        self.__get_model = get_model
+        self.__max_batch_size = max_batch_size or int(os.getenv("DETECTION_MAX_BATCH_SIZE", "8"))
+        if max_wait_ms is None:
+            max_wait_ms = float(os.getenv("DETECTION_MAX_WAIT_MS", "20"))
+        self.__max_wait = max_wait_ms / 1000.0
+
+        self.__queues = {option: queue.Queue() for option in options}
+        self.__workers = []
+        for option in options:
+            worker = threading.Thread(target=self.__run, args=(option,), name=f"inference-{option}", daemon=True)
+            worker.start()
+            self.__workers.append(worker)
+
+    def submit(self, image, option):
+        if option not in self.__queues:
+            raise ValueError(f"Unknown detection option '{option}'")
+
+        future = Future()
+        self.__queues[option].put((image, future))
+        return future
+
+    def predict(self, image, option, timeout=None):
+        return self.submit(image, option).result(timeout=timeout)
+
+    def shutdown(self):
+        for q in self.__queues.values():
+            q.put(None)
+        for worker in self.__workers:
+            worker.join()
+
+    def __collect_batch(self, q):
+        item = q.get()
+        if item is None:
+            return None
+
+        batch = [item]
+        deadline = time.monotonic() + self.__max_wait
+        while len(batch) < self.__max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = q.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                # sisakan sinyal stop untuk iterasi berikutnya
+                q.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def __run(self, option):
+        q = self.__queues[option]
+
+        while True:
+            batch = self.__collect_batch(q)
+            if batch is None:
+                break
+
+            batch = [(image, future) for image, future in batch if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+
+            images = [image for image, _ in batch]
+            try:
+                # model dimuat lazy saat batch pertama masuk
+                model = self.__get_model(option)
+                results = model(images, verbose=False)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            # satu Results per gambar, dibungkus list agar sama dengan pemanggilan model(image)
+            for (_, future), result in zip(batch, results):
+                future.set_result([result])
@@ -0,0 +1,119 @@
+import gc
+import io
+import multiprocessing
+import os
+import queue
+import re
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+from PIL import Image, ImageOps
+
+_detection_controller = None
+_detection_model = None
+
+
+def _init_worker(threads, status_queue):
+    global _detection_controller, _detection_model
+
+    # batasi thread per proses agar jumlah worker bisa disesuaikan dengan core;
+    # env saja tidak cukup bila torch/cv2 sudah diimpor, jadi atur juga lewat API-nya
+    os.environ["OMP_NUM_THREADS"] = str(threads)
+    os.environ["MKL_NUM_THREADS"] = str(threads)
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+    try:
+        import cv2
+        cv2.setNumThreads(threads)
+    except ImportError:
+        pass
+
+    from model.detection_model import DetectionModel
+    from controller.detection_controller import DetectionController
+
+    _detection_model = DetectionModel()
+    _detection_model.warm_up(background=False)
+    _detection_controller = DetectionController(np, Image, ImageOps, re, io, _detection_model)
+    # laporkan status ke proses utama lewat queue terpisah, bukan lewat antrean job
+    status_queue.put((os.getpid(), _detection_model.get_status()))
+
+
+def _detect_shared(name, shape, dtype, option):
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        # view langsung ke shared memory, tanpa salinan
+        image = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+        data = _detection_controller.detect_array(image, option)
+        del image
+        return data
+    finally:
+        try:
+            shm.close()
+        except BufferError:
+            gc.collect()
+            shm.close()
+
+
+def _ping():
+    return os.getpid()
+
+
+class WorkerPoolController:
+    def __init__(self, num_workers, threads_per_worker=None, timeout=None):
+        self.__num_workers = num_workers
+        self.__threads = threads_per_worker or int(os.getenv("DETECTION_WORKER_THREADS", "1"))
+        self.__timeout = timeout or float(os.getenv("DETECTION_WORKER_TIMEOUT", "60"))
+        context = multiprocessing.get_context("spawn")
+        self.__status_queue = context.Queue()
+        self.__worker_status = {}
+        self.__executor = ProcessPoolExecutor(
+            max_workers=num_workers,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(self.__threads, self.__status_queue)
+        )
+
+        # proses worker baru dibuat saat ada task; picu sekarang supaya model langsung dimuat
+        if os.getenv("DETECTION_WARMUP", "true").lower() == "true":
+            for _ in range(num_workers):
+                self.__executor.submit(_ping)
+
+    def detect(self, image, option):
+        width, height = image.size
+        shape = (height, width, 3)
+        size = height * width * 3
+
+        shm = shared_memory.SharedMemory(create=True, size=size)
+        try:
+            buffer = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf)
+            buffer[:] = np.asarray(image)
+            del buffer
+
+            future = self.__executor.submit(_detect_shared, shm.name, shape, np.uint8, option)
+            return future.result(timeout=self.__timeout)
+        finally:
+            shm.close()
+            shm.unlink()
+
+    def get_status(self):
+        # status terakhir yang dilaporkan tiap worker setelah warm-up; tidak pernah menunggu antrean deteksi
+        while True:
+            try:
+                pid, status = self.__status_queue.get_nowait()
+            except queue.Empty:
+                break
+            self.__worker_status[pid] = status
+
+        ready = [status for status in self.__worker_status.values() if status.get("ready")]
+        latest = ready[-1] if ready else next(reversed(self.__worker_status.values()), None)
+        status = dict(latest) if latest else {"ready": False, "models": {}}
+        status["workers"] = self.__num_workers
+        status["workers_ready"] = len(ready)
+        return status
+
+    def shutdown(self):
+        self.__executor.shutdown(wait=True)
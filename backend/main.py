@@ -1,4 +1,3 @@
-from api import Api
 from flask import Flask
 import os
 from dotenv import load_dotenv
@@ -6,10 +5,21 @@ from flask_cors import CORS
 
 load_dotenv()
 
-app = Flask(__name__)
-app.secret_key = os.getenv("SECRET_KEY_FLASK")
-CORS(app, supports_credentials=True)
-api = Api(app)
+def create_app():
+    from api import Api
+
+    app = Flask(__name__)
+    app.secret_key = os.getenv("SECRET_KEY_FLASK")
+    # batas keras untuk semua request; body yang lebih besar ditolak werkzeug dengan 413
+    app.config['MAX_CONTENT_LENGTH'] = int(os.getenv("MAX_CONTENT_LENGTH", str(16 * 1024 * 1024)))
+    CORS(app, supports_credentials=True)
+    Api(app)
+    return app
+
+# worker deteksi (spawn) mengimpor ulang modul ini sebagai __mp_main__;
+# aplikasi Flask (OAuth, Supabase, Midtrans, model) hanya dibangun di proses utama
+if __name__ != '__mp_main__':
+    app = create_app()
 
 if __name__ == '__main__':
-    app.run()
\ No newline at end of file
+    app.run()
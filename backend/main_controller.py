@@ -1,26 +1,36 @@
 from main_model import MainModel
+from model.detection_model import DetectionModel
+from model.detection_cache_model import DetectionCacheModel
 
 from authlib.integrations.flask_client import OAuth
 import midtransclient
 import os
-from ultralytics import YOLO
-from PIL import Image
+from PIL import Image, ImageOps
 import numpy as np
-import easyocr
 import re
 import io
 
 from controller.user_controller import UserController
 from controller.detection_controller import DetectionController
+from controller.inference_controller import InferenceController
+from controller.worker_pool_controller import WorkerPoolController
 from controller.order_controller import OrderController
 from controller.family_controller import FamilyController
 from controller.seat_controller import SeatController
 
 class MainController:
     def __init__(self, app_instance):
-        self.__model_ktp = YOLO("model_detection\\model_ktp.pt")
-        self.__model_kk = YOLO("model_detection\\model_kk.pt")
-        self.__reader = easyocr.Reader(['id'], gpu=False)
+        # hanya dibangun di proses utama; worker deteksi memuat modelnya sendiri (lihat main.py)
+        detection_workers = int(os.getenv("DETECTION_WORKERS", "0"))
+
+        self.__detection_model = DetectionModel()
+        self.__detection_cache = DetectionCacheModel()
+        if detection_workers > 0:
+            self.__worker_pool = WorkerPoolController(detection_workers)
+        else:
+            self.__worker_pool = None
+            if os.getenv("DETECTION_WARMUP", "true").lower() == "true":
+                self.__detection_model.warm_up()
 
         self.__oauth = OAuth(app_instance)
         self.__google = self.__oauth.register(
@@ -46,7 +56,11 @@ class MainController:
         self.__database = MainModel()
 
         self.__user_controller = UserController(self.__database, self.__google)
-        self.__detection_controller = DetectionController(np, Image, re, io, self.__reader, self.__model_ktp, self.__model_kk)
+        if self.__worker_pool is None:
+            self.__inference_controller = InferenceController(self.__detection_model.get_model, self.__detection_model.get_options())
+        else:
+            self.__inference_controller = None
+        self.__detection_controller = DetectionController(np, Image, ImageOps, re, io, self.__detection_model, self.__inference_controller, self.__worker_pool, self.__detection_cache)
         self.__order_controller = OrderController(self.__database, self.__snap, self.__core_api)
         self.__family_controller = FamilyController(self.__database)
         self.__seat_controller = SeatController(self.__database)
@@ -79,6 +93,10 @@ class MainController:
         data = self.__detection_controller.detect(image_file, option)
         return data
     
+    def get_detection_status(self):
+        data = self.__detection_controller.get_status()
+        return data
+
     def delete_image(self, url):
         self.__user_controller.delete_image(url)
 
@@ -0,0 +1,60 @@
+import copy
+import os
+import threading
+import time
+from collections import OrderedDict
+
+class DetectionCacheModel:
+    def __init__(self, max_size=None, ttl=None):
+        self.__max_size = max_size if max_size is not None else int(os.getenv("DETECTION_CACHE_SIZE", "256"))
+        self.__ttl = ttl if ttl is not None else float(os.getenv("DETECTION_CACHE_TTL", "600"))
+        self.__items = OrderedDict()
+        self.__lock = threading.Lock()
+        self.__hits = 0
+        self.__misses = 0
+        self.__evictions = 0
+
+    def get(self, key):
+        with self.__lock:
+            item = self.__items.get(key)
+            if item is None:
+                self.__misses += 1
+                return None
+
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self.__items[key]
+                self.__misses += 1
+                return None
+
+            self.__items.move_to_end(key)
+            self.__hits += 1
+        return copy.deepcopy(value)
+
+    def set(self, key, value):
+        if self.__max_size <= 0:
+            return
+
+        with self.__lock:
+            self.__items[key] = (time.monotonic() + self.__ttl, copy.deepcopy(value))
+            self.__items.move_to_end(key)
+            while len(self.__items) > self.__max_size:
+                self.__items.popitem(last=False)
+                self.__evictions += 1
+
+    def clear(self):
+        with self.__lock:
+            self.__items.clear()
+
+    def get_stats(self):
+        with self.__lock:
+            total = self.__hits + self.__misses
+            return {
+                "size": len(self.__items),
+                "max_size": self.__max_size,
+                "ttl": self.__ttl,
+                "hits": self.__hits,
+                "misses": self.__misses,
+                "evictions": self.__evictions,
+                "hit_rate": self.__hits / total if total else 0.0,
+            }
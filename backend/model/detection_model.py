@@ -0,0 +1,128 @@
+import os
+import threading
+
+# akhiran berkas bobot per backend, lihat scripts/export_detection_model.py
+BACKEND_SUFFIXES = {
+    'torch': '.pt',
+    'onnx': '.onnx',
+    'onnx-int8': '_int8.onnx',
+    'openvino': '_openvino_model',
+}
+
+class DetectionModel:
+    def __init__(self, backend=None):
+        self.__backend = backend or os.getenv("DETECTION_BACKEND", "torch")
+        if self.__backend not in BACKEND_SUFFIXES:
+            raise ValueError(f"Unknown detection backend '{self.__backend}'")
+
+        suffix = BACKEND_SUFFIXES[self.__backend]
+        self.__paths = {
+            'ktp': os.getenv("MODEL_KTP_PATH", os.path.join("model_detection", f"model_ktp{suffix}")),
+            'kk': os.getenv("MODEL_KK_PATH", os.path.join("model_detection", f"model_kk{suffix}")),
+        }
+        self.__languages = os.getenv("OCR_LANGUAGES", "id").split(",")
+
+        self.__models = {}
+        self.__reader = None
+        self.__errors = {}
+        self.__locks = {name: threading.Lock() for name in [*self.__paths, 'reader']}
+        self.__warm_up_thread = None
+
+    def get_backend(self):
+        return self.__backend
+
+    def get_version(self, option):
+        # berubah ketika backend atau berkas bobot diganti, dipakai sebagai bagian kunci cache
+        path = self.__paths[option]
+        try:
+            stat = os.stat(path)
+            stamp = f"{stat.st_mtime_ns}-{stat.st_size}"
+        except OSError:
+            stamp = "missing"
+        return f"{self.__backend}:{os.path.basename(path)}:{stamp}"
+
+    def get_options(self):
+        return list(self.__paths)
+
+    def get_model(self, option):
+        if option not in self.__paths:
+            raise ValueError(f"Unknown detection option '{option}'")
+
+        model = self.__models.get(option)
+        if model is not None:
+            return model
+
+        with self.__locks[option]:
+            if option not in self.__models:
+                self.__models[option] = self.__load(option, self.__load_detector, self.__paths[option])
+            return self.__models[option]
+
+    def get_reader(self):
+        if self.__reader is not None:
+            return self.__reader
+
+        with self.__locks['reader']:
+            if self.__reader is None:
+                self.__reader = self.__load('reader', self.__load_reader)
+            return self.__reader
+
+    def warm_up(self, background=True):
+        if not background:
+            self.__warm_up()
+            return
+
+        if self.__warm_up_thread is None:
+            self.__warm_up_thread = threading.Thread(target=self.__warm_up, name="detection-warm-up", daemon=True)
+            self.__warm_up_thread.start()
+
+    def is_ready(self):
+        return all(option in self.__models for option in self.__paths) and self.__reader is not None
+
+    def get_status(self):
+        status = {}
+        for name in [*self.__paths, 'reader']:
+            loaded = self.__reader is not None if name == 'reader' else name in self.__models
+            if loaded:
+                status[name] = 'loaded'
+            elif name in self.__errors:
+                status[name] = f"error: {self.__errors[name]}"
+            elif self.__locks[name].locked():
+                status[name] = 'loading'
+            else:
+                status[name] = 'not_loaded'
+
+        return {"ready": self.is_ready(), "backend": self.__backend, "models": status}
+
+    def __warm_up(self):
+        for option in self.__paths:
+            try:
+                self.get_model(option)
+            except Exception as e:
+                print(f"Failed to load detection model '{option}': {e}")
+        try:
+            self.get_reader()
+        except Exception as e:
+            print(f"Failed to load OCR reader: {e}")
+
+    def __load(self, name, loader, *args):
+        try:
+            loaded = loader(*args)
+        except Exception as e:
+            self.__errors[name] = str(e)
+            raise
+        self.__errors.pop(name, None)
+        return loaded
+
+    def __load_detector(self, path):
+        if self.__backend in ('onnx', 'onnx-int8'):
+            # onnxruntime langsung, tanpa torch di jalur inferensi
+            from model.onnx_yolo_model import OnnxYoloModel
+            return OnnxYoloModel(path)
+
+        # import di sini agar torch/ultralytics tidak ikut dimuat saat boot
+        from ultralytics import YOLO
+        return YOLO(path, task='detect')
+
+    def __load_reader(self):
+        import easyocr
+        return easyocr.Reader(self.__languages, gpu=False)
@@ -0,0 +1,122 @@
+import ast
+import os
+
+import cv2
+import numpy as np
+
+class OnnxYoloResult:
+    def __init__(self, names, boxes):
+        self.names = names
+        self.boxes = boxes
+
+
+class OnnxYoloBox:
+    def __init__(self, cls, xyxy, conf):
+        self.cls = cls
+        self.xyxy = xyxy
+        self.conf = conf
+
+
+class OnnxYoloModel:
+    def __init__(self, path, conf=0.25, iou=0.7, threads=None):
+        # import di sini agar onnxruntime hanya dibutuhkan saat backend onnx dipakai
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        threads = threads if threads is not None else int(os.getenv("DETECTION_ONNX_THREADS", "0"))
+        if threads > 0:
+            options.intra_op_num_threads = threads
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+
+        self.__session = ort.InferenceSession(path, sess_options=options, providers=["CPUExecutionProvider"])
+        self.__input = self.__session.get_inputs()[0]
+        self.__conf = conf
+        self.__iou = iou
+
+        metadata = self.__session.get_modelmeta().custom_metadata_map
+        self.names = ast.literal_eval(metadata["names"]) if "names" in metadata else {}
+        imgsz = ast.literal_eval(metadata["imgsz"]) if "imgsz" in metadata else [640, 640]
+        self.__imgsz = (int(imgsz[0]), int(imgsz[1]))
+        # batch statis (1) saat diekspor tanpa dynamic=True
+        self.__dynamic_batch = not isinstance(self.__input.shape[0], int)
+
+    def __call__(self, images, verbose=False):
+        if not isinstance(images, (list, tuple)):
+            images = [images]
+
+        inputs = [self.__letterbox(image) for image in images]
+        if self.__dynamic_batch:
+            outputs = self.__session.run(None, {self.__input.name: np.stack([x for x, _, _ in inputs])})[0]
+        else:
+            outputs = np.concatenate([self.__session.run(None, {self.__input.name: x[None]})[0] for x, _, _ in inputs])
+
+        results = []
+        for output, (_, gain, pad) in zip(outputs, inputs):
+            results.append(OnnxYoloResult(self.names, self.__postprocess(output, gain, pad)))
+        return results
+
+    def __letterbox(self, image):
+        # image: array BGR (H, W, 3), sama seperti input ultralytics
+        height, width = image.shape[:2]
+        new_h, new_w = self.__imgsz
+        gain = min(new_h / height, new_w / width)
+        resized_w, resized_h = round(width * gain), round(height * gain)
+        pad_x, pad_y = (new_w - resized_w) / 2, (new_h - resized_h) / 2
+
+        if (resized_w, resized_h) != (width, height):
+            image = cv2.resize(image, (resized_w, resized_h), interpolation=cv2.INTER_LINEAR)
+        top, bottom = round(pad_y - 0.1), round(pad_y + 0.1)
+        left, right = round(pad_x - 0.1), round(pad_x + 0.1)
+        image = cv2.copyMakeBorder(image, top, bottom, left, right, cv2.BORDER_CONSTANT, value=(114, 114, 114))
+
+        tensor = image[..., ::-1].transpose(2, 0, 1)
+        tensor = np.ascontiguousarray(tensor, dtype=np.float32) / 255.0
+        return tensor, gain, (left, top)
+
+    def __postprocess(self, output, gain, pad):
+        # output: (4 + nc, N) -> cx, cy, w, h, skor per kelas
+        preds = output.T
+        scores = preds[:, 4:]
+        class_ids = scores.argmax(axis=1)
+        confidences = scores[np.arange(len(scores)), class_ids]
+
+        keep = confidences > self.__conf
+        preds, class_ids, confidences = preds[keep], class_ids[keep], confidences[keep]
+        if len(preds) == 0:
+            return []
+
+        xyxy = np.empty((len(preds), 4), dtype=np.float32)
+        xyxy[:, 0] = preds[:, 0] - preds[:, 2] / 2
+        xyxy[:, 1] = preds[:, 1] - preds[:, 3] / 2
+        xyxy[:, 2] = preds[:, 0] + preds[:, 2] / 2
+        xyxy[:, 3] = preds[:, 1] + preds[:, 3] / 2
+
+        keep = self.__nms(xyxy, confidences, class_ids)
+
+        xyxy = xyxy[keep]
+        xyxy[:, [0, 2]] -= pad[0]
+        xyxy[:, [1, 3]] -= pad[1]
+        xyxy /= gain
+
+        return [
+            OnnxYoloBox(int(class_ids[i]), box[None], float(confidences[i]))
+            for i, box in zip(keep, xyxy)
+        ]
+
+    def __nms(self, xyxy, confidences, class_ids):
+        # NMS per kelas: geser kotak berdasarkan kelas agar tidak saling menekan
+        boxes = xyxy + class_ids[:, None] * 7680.0
+        areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+        order = confidences.argsort()[::-1]
+
+        keep = []
+        while order.size > 0:
+            i = order[0]
+            keep.append(i)
+            rest = order[1:]
+            w = np.clip(np.minimum(boxes[i, 2], boxes[rest, 2]) - np.maximum(boxes[i, 0], boxes[rest, 0]), 0, None)
+            h = np.clip(np.minimum(boxes[i, 3], boxes[rest, 3]) - np.maximum(boxes[i, 1], boxes[rest, 1]), 0, None)
+            inter = w * h
+            iou = inter / (areas[i] + areas[rest] - inter + 1e-7)
+            order = rest[iou <= self.__iou]
+        return keep
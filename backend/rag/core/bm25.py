@@ -0,0 +1,129 @@
+# backend/rag/core/bm25.py
+# BM25 di atas inverted index sparse (scipy CSR, baris = term, kolom = dokumen).
+# Bobot BM25 tiap (term, dokumen) dihitung sekali saat build (IDF + normalisasi panjang),
+# sehingga skor query = jumlah baris term query; hanya dokumen yang memuat term yang disentuh.
+import os, re, json, numpy as np
+from collections import Counter
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+from scipy import sparse
+
+BM25_K1 = float(os.getenv("BM25_K1", "1.5"))
+BM25_B = float(os.getenv("BM25_B", "0.75"))
+BM25_STOPWORDS = os.getenv("BM25_STOPWORDS", "true").lower() == "true"
+BM25_STEMMER = os.getenv("BM25_STEMMER", "none")     # none | sastrawi (pip install Sastrawi)
+
+_TOKEN_RE = re.compile(r"[^\W_]+", re.UNICODE)   # buang tanda baca: "e-KTP," -> ["e", "ktp"]
+
+# kata fungsi bahasa Indonesia yang hampir selalu muncul dan tidak membedakan dokumen
+STOPWORDS_ID = frozenset("""
+ada adalah agar akan aku anda apa apabila atau bagi bahwa bila bisa dalam dan dapat dari dengan di dia
+harus hal hanya ia ini itu jika juga kami kamu karena ke kita lagi maka mana masih mereka nya oleh
+pada para saat saja sama sebagai sedang sehingga sejak seperti serta setelah sudah supaya tersebut
+untuk yaitu yakni yang
+""".split())
+
+@lru_cache(maxsize=1)
+def _stemmer():
+    if BM25_STEMMER != "sastrawi":
+        return None
+    from Sastrawi.Stemmer.StemmerFactory import StemmerFactory  # type: ignore
+    return StemmerFactory().create_stemmer()
+
+@lru_cache(maxsize=65536)
+def _stem(token: str) -> str:
+    return _stemmer().stem(token)
+
+def tokenizer_config() -> Dict:
+    # disimpan bersama index; index dibangun ulang bila konfigurasi tokenizer/parameter berubah
+    return {"k1": BM25_K1, "b": BM25_B, "stopwords": BM25_STOPWORDS, "stemmer": BM25_STEMMER}
+
+def tokenize(text: str) -> List[str]:
+    tokens = _TOKEN_RE.findall(text.casefold())
+    if BM25_STOPWORDS:
+        tokens = [t for t in tokens if t not in STOPWORDS_ID]
+    if _stemmer() is not None:
+        tokens = [_stem(t) for t in tokens]
+    return tokens
+
+class BM25Index:
+    def __init__(self, vocab: Dict[str, int], weights: sparse.csr_matrix, config: Dict):
+        self.vocab = vocab
+        self.weights = weights      # (V, N) bobot BM25 siap jumlah
+        self.config = config
+
+    @property
+    def n_docs(self) -> int:
+        return self.weights.shape[1]
+
+    @classmethod
+    def build(cls, corpus: List[str], k1: float = BM25_K1, b: float = BM25_B) -> "BM25Index":
+        vocab: Dict[str, int] = {}
+        rows, cols, tfs = [], [], []
+        lengths = np.zeros(len(corpus), dtype=np.float32)
+        for doc_id, text in enumerate(corpus):
+            tokens = tokenize(text)
+            lengths[doc_id] = len(tokens)
+            for term, tf in Counter(tokens).items():
+                rows.append(vocab.setdefault(term, len(vocab)))
+                cols.append(doc_id)
+                tfs.append(tf)
+
+        rows = np.asarray(rows, dtype=np.int64)
+        cols = np.asarray(cols, dtype=np.int64)
+        tf = np.asarray(tfs, dtype=np.float32)
+        n = len(corpus)
+        avgdl = float(lengths.mean()) if n and lengths.sum() else 1.0
+
+        # idf gaya Lucene (selalu positif), normalisasi panjang per dokumen
+        df = np.bincount(rows, minlength=len(vocab)).astype(np.float32)
+        idf = np.log1p((n - df + 0.5) / (df + 0.5))
+        norm = k1 * (1.0 - b + b * lengths / avgdl)
+        data = idf[rows] * tf * (k1 + 1.0) / (tf + norm[cols])
+        weights = sparse.csr_matrix((data.astype(np.float32), (rows, cols)), shape=(len(vocab), n))
+        return cls(vocab, weights, {**tokenizer_config(), "k1": k1, "b": b})
+
+    def search(self, query: str) -> Tuple[np.ndarray, np.ndarray]:
+        """(id dokumen terurut, skor) hanya untuk dokumen yang memuat minimal satu term query."""
+        counts = Counter(self.vocab[t] for t in tokenize(query) if t in self.vocab)
+        if not counts:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        term_ids = np.fromiter(counts.keys(), dtype=np.int64)
+        qtf = np.fromiter(counts.values(), dtype=np.float32)   # term berulang di query dihitung berulang
+        q = sparse.csr_matrix((qtf, (np.zeros(len(term_ids), dtype=np.int64), np.arange(len(term_ids)))),
+                              shape=(1, len(term_ids)))
+        hit = (q @ self.weights[term_ids]).tocsr()
+        hit.sort_indices()
+        return hit.indices.astype(np.int64), hit.data.astype(np.float32)
+
+    def save(self, path: str) -> None:
+        terms = np.empty(len(self.vocab), dtype=object)
+        for term, i in self.vocab.items():
+            terms[i] = term
+        tmp = path + ".tmp.npz"
+        np.savez(
+            tmp, data=self.weights.data, indices=self.weights.indices, indptr=self.weights.indptr,
+            shape=np.asarray(self.weights.shape), terms=terms.astype(str), config=json.dumps(self.config),
+        )
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Index":
+        arr = np.load(path)
+        weights = sparse.csr_matrix((arr["data"], arr["indices"], arr["indptr"]), shape=tuple(arr["shape"]))
+        vocab = {str(t): i for i, t in enumerate(arr["terms"])}
+        return cls(vocab, weights, json.loads(str(arr["config"])))
+
+def load_or_build(path: Optional[str], corpus: List[str]) -> BM25Index:
+    """Pakai index tersimpan bila cocok dengan korpus & konfigurasi saat ini; bila tidak, bangun (dan simpan)."""
+    if path and os.path.exists(path):
+        try:
+            index = BM25Index.load(path)
+            if index.n_docs == len(corpus) and index.config == tokenizer_config():
+                return index
+        except (OSError, ValueError, KeyError):
+            pass
+    index = BM25Index.build(corpus)
+    if path:
+        index.save(path)
+    return index
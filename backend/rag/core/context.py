@@ -0,0 +1,112 @@
+# backend/rag/core/context.py
+# Penyusun konteks RAG dengan budget token:
+# 1) buang chunk duplikat / yang sudah termuat di chunk lain
+# 2) gabungkan chunk bertetangga dari sumber yang sama (overlap dari simple_chunk / index lama tidak dikirim dua kali;
+#    chunk markdown_chunk tidak ber-overlap, jadi cukup dedupe)
+# 3) isi budget berdasarkan skor; blok terakhir dipotong di batas kata bila tidak muat utuh
+import os
+from typing import Dict, List, Tuple
+from rag.core.tokens import count_tokens
+
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1200"))
+MIN_OVERLAP = 20          # karakter; overlap lebih pendek dianggap kebetulan
+MAX_OVERLAP = 400
+MIN_TAIL_TOKENS = 64      # sisa budget lebih kecil dari ini tidak diisi potongan blok
+SEPARATOR = "\n\n---\n"
+
+def _overlap(a: str, b: str) -> int:
+    # panjang suffix `a` yang sama dengan prefix `b`
+    for k in range(min(len(a), len(b), MAX_OVERLAP), MIN_OVERLAP - 1, -1):
+        if a.endswith(b[:k]):
+            return k
+    return 0
+
+def _merge_source(blocks: List[Dict]) -> List[Dict]:
+    merged = True
+    while merged and len(blocks) > 1:
+        merged = False
+        for i in range(len(blocks)):
+            for j in range(len(blocks)):
+                if i == j:
+                    continue
+                a, b = blocks[i], blocks[j]
+                if b["text"] in a["text"]:
+                    text = a["text"]
+                else:
+                    k = _overlap(a["text"], b["text"])
+                    if not k:
+                        continue
+                    text = a["text"] + b["text"][k:]
+                blocks[i] = {**a, "text": text, "score": max(a["score"], b["score"])}
+                del blocks[j]
+                merged = True
+                break
+            if merged:
+                break
+    return blocks
+
+def dedupe_and_merge(hits: List[Dict]) -> List[Dict]:
+    by_source: Dict[str, List[Dict]] = {}
+    seen = set()
+    for h in hits:
+        key = " ".join(h["text"].split())
+        if key in seen:
+            continue
+        seen.add(key)
+        by_source.setdefault(h["source"], []).append(
+            {"source": h["source"], "text": h["text"], "score": float(h.get("score", 0.0))}
+        )
+    blocks = [b for group in by_source.values() for b in _merge_source(group)]
+    return sorted(blocks, key=lambda b: b["score"], reverse=True)
+
+def _format(block: Dict) -> str:
+    return f"[{block['source']}]\n{block['text']}"
+
+def _truncate_to(text: str, tokens: int) -> str:
+    # perkiraan proporsional, lalu mundur ke spasi terakhir sampai muat
+    cut = max(1, int(len(text) * tokens / max(count_tokens(text), 1)))
+    while cut > 0:
+        piece = text[:cut].rsplit(None, 1)[0] if " " in text[:cut] else text[:cut]
+        if count_tokens(piece + " …") <= tokens:
+            return piece + " …"
+        cut = int(cut * 0.9)
+    return ""
+
+def pack_context(hits: List[Dict], budget: int = CONTEXT_TOKEN_BUDGET) -> Tuple[str, List[Dict]]:
+    """Teks konteks untuk system prompt + blok yang dipakai, paling relevan lebih dulu."""
+    parts: List[str] = []
+    used_blocks: List[Dict] = []
+    used = 0
+    for block in dedupe_and_merge(hits):
+        sep = count_tokens(SEPARATOR) if parts else 0
+        text = _format(block)
+        tokens = count_tokens(text) + sep
+        if used + tokens <= budget:
+            parts.append(text)
+            used_blocks.append(block)
+            used += tokens
+            continue
+        remaining = budget - used - sep - count_tokens(f"[{block['source']}]\n")
+        if remaining >= MIN_TAIL_TOKENS:
+            piece = _truncate_to(block["text"], remaining)
+            if piece:
+                parts.append(_format({**block, "text": piece}))
+                used_blocks.append({**block, "text": piece})
+        break
+    return SEPARATOR.join(parts), used_blocks
+
+def trim_messages(messages: List[Dict], budget: int, keep_last: bool = False) -> List[Dict]:
+    """Pesan terbaru yang muat dalam budget token; pesan lama dibuang lebih dulu.
+    `keep_last`: pesan terakhir (pertanyaan user) selalu ikut walau melebihi budget."""
+    out: List[Dict] = []
+    used = 0
+    for m in reversed(messages):
+        used += count_tokens(m["content"]) + 4   # +4: overhead role/format per pesan
+        if used > budget and not (keep_last and not out):
+            break
+        out.append(m)
+    out.reverse()
+    # jangan mulai riwayat dengan jawaban assistant tanpa pertanyaannya
+    if len(out) > 1 and out[0]["role"] == "assistant":
+        out = out[1:]
+    return out
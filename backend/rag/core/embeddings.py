@@ -0,0 +1,107 @@
+# backend/rag/core/embeddings.py
+# Registry encoder embedding: satu instance per proses untuk tiap model
+# (BGE-M3, MiniLM, dan encoder lain yang didaftarkan lewat `register`).
+import os, time, logging, threading, numpy as np
+from typing import Callable, Dict, List, Optional
+from rag.core.settings import settings
+
+MINILM = "minilm"
+BGE_M3 = "bge-m3"
+BGE_M3_MODEL = os.getenv("BGE_M3_MODEL", "BAAI/bge-m3")
+EMBEDDING_WARMUP = os.getenv("EMBEDDING_WARMUP", "true").lower() == "true"
+EMBEDDING_RETRY = float(os.getenv("EMBEDDING_RETRY", "60"))   # detik sebelum load yang gagal dicoba lagi
+
+log = logging.getLogger("embeddings")
+log.setLevel(logging.INFO)
+
+# -------- loaders --------
+def _load_minilm():
+    from sentence_transformers import SentenceTransformer  # type: ignore
+    return SentenceTransformer(settings.EMBEDDING_MODEL)
+
+def _load_bge_m3():
+    from FlagEmbedding import BGEM3FlagModel  # type: ignore
+    # CPU-ok; set devices=["cuda:0"] bila ada GPU
+    return BGEM3FlagModel(BGE_M3_MODEL, use_fp16=False, devices=["cpu"])
+
+_LOADERS: Dict[str, Callable[[], object]] = {MINILM: _load_minilm, BGE_M3: _load_bge_m3}
+_MODEL_NAMES: Dict[str, str] = {MINILM: settings.EMBEDDING_MODEL, BGE_M3: BGE_M3_MODEL}
+_models: Dict[str, Optional[object]] = {}
+_retry_at: Dict[str, float] = {}   # load gagal sementara (jaringan/HF): jangan dicoba sebelum waktu ini
+_lock = threading.Lock()
+
+def register(name: str, loader: Callable[[], object], model_name: Optional[str] = None) -> None:
+    with _lock:
+        _LOADERS[name] = loader
+        _MODEL_NAMES[name] = model_name or name
+        _models.pop(name, None)
+        _retry_at.pop(name, None)
+
+def model_name(name: str) -> str:
+    return _MODEL_NAMES[name]
+
+def get_model(name: str):
+    """Instance encoder `name`; dimuat sekali. None bila paket tidak terpasang (permanen)
+    atau load terakhir gagal kurang dari EMBEDDING_RETRY detik lalu."""
+    if name in _models:
+        return _models[name]
+    if time.monotonic() < _retry_at.get(name, 0.0):
+        return None
+    with _lock:
+        if name in _models:
+            return _models[name]
+        if time.monotonic() < _retry_at.get(name, 0.0):
+            return None
+        try:
+            _models[name] = _LOADERS[name]()
+            _retry_at.pop(name, None)
+        except ImportError as e:
+            # paketnya memang tidak ada: tidak akan berhasil sampai restart
+            log.warning("Embedding model %s not available (%s).", name, e)
+            _models[name] = None
+        except Exception as e:
+            # gagal sementara (download HF, jaringan, disk): coba lagi setelah backoff, bukan per query
+            log.warning("Loading embedding model %s failed (%s); retrying in %.0fs.", name, e, EMBEDDING_RETRY)
+            _retry_at[name] = time.monotonic() + EMBEDDING_RETRY
+            return None
+        return _models[name]
+
+def retrying(name: str) -> bool:
+    # load terakhir gagal sementara dan akan dicoba lagi (bukan paket yang tidak terpasang)
+    return name in _retry_at
+
+# -------- encode --------
+def encode_minilm(texts: List[str], batch_size: int = 64) -> np.ndarray:
+    model = get_model(MINILM)
+    if model is None:
+        raise RuntimeError(f"Embedding model {settings.EMBEDDING_MODEL} tidak dapat dimuat")
+    return np.asarray(model.encode(texts, batch_size=batch_size, normalize_embeddings=False), dtype=np.float32)
+
+def encode_bge_m3(texts: List[str], batch_size: int = 24) -> np.ndarray:
+    model = get_model(BGE_M3)
+    if model is None:
+        raise RuntimeError(f"Embedding model {BGE_M3_MODEL} tidak dapat dimuat")
+    enc = model.encode(texts, batch_size=batch_size, max_length=8192, use_fp16=False, return_dense=True)
+    return np.asarray(enc["dense_vecs"], dtype=np.float32)
+
+# -------- warm-up --------
+def warm_up(names: Optional[List[str]] = None, background: bool = True) -> None:
+    """Muat encoder dan jalankan satu encode kecil agar query pertama tidak menanggung biaya load."""
+    def _run():
+        for name in names or list(_LOADERS):
+            model = get_model(name)
+            if model is None:
+                continue
+            try:
+                if name == BGE_M3:
+                    encode_bge_m3(["pemanasan"])
+                elif name == MINILM:
+                    encode_minilm(["pemanasan"])
+                log.info("Embedding model %s ready.", name)
+            except Exception as e:
+                log.warning("Warm-up of %s failed: %s", name, e)
+
+    if background:
+        threading.Thread(target=_run, name="embedding-warmup", daemon=True).start()
+    else:
+        _run()
@@ -0,0 +1,72 @@
+# backend/rag/core/executor.py
+# Retrieval (encode query, BM25, numpy) dijalankan di thread pool terbatas, bukan di event loop.
+# Torch/numpy melepas GIL pada bagian beratnya, jadi thread cukup tanpa biaya proses terpisah.
+# Backpressure: paling banyak RETRIEVAL_WORKERS + RETRIEVAL_MAX_QUEUE job sekaligus; sisanya
+# menunggu slot maksimal RETRIEVAL_QUEUE_TIMEOUT detik lalu ditolak (RetrievalBusy -> HTTP 503).
+import os, asyncio, functools, threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional, TypeVar
+
+RETRIEVAL_WORKERS = int(os.getenv("RETRIEVAL_WORKERS", str(min(4, os.cpu_count() or 1))))
+RETRIEVAL_MAX_QUEUE = int(os.getenv("RETRIEVAL_MAX_QUEUE", "32"))
+RETRIEVAL_QUEUE_TIMEOUT = float(os.getenv("RETRIEVAL_QUEUE_TIMEOUT", "2"))
+
+T = TypeVar("T")
+
+class RetrievalBusy(RuntimeError):
+    """Antrian retrieval penuh; klien sebaiknya mencoba lagi."""
+
+_executor: Optional[ThreadPoolExecutor] = None
+_slots: Optional[asyncio.Semaphore] = None
+_lock = threading.Lock()
+_stats = {"in_flight": 0, "completed": 0, "rejected": 0}
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=RETRIEVAL_WORKERS, thread_name_prefix="retrieval")
+        return _executor
+
+def _get_slots() -> asyncio.Semaphore:
+    # dibuat di dalam event loop yang memakainya
+    global _slots
+    if _slots is None:
+        _slots = asyncio.Semaphore(RETRIEVAL_WORKERS + RETRIEVAL_MAX_QUEUE)
+    return _slots
+
+async def run_retrieval(fn: Callable[..., T], *args, **kwargs) -> T:
+    slots = _get_slots()
+    try:
+        await asyncio.wait_for(slots.acquire(), timeout=RETRIEVAL_QUEUE_TIMEOUT)
+    except asyncio.TimeoutError:
+        _stats["rejected"] += 1
+        raise RetrievalBusy("Server sedang sibuk, silakan coba lagi.")
+    _stats["in_flight"] += 1
+    loop = asyncio.get_running_loop()
+
+    def _done(_):
+        # slot dilepas saat job thread selesai, bukan saat request dibatalkan (klien putus):
+        # job yang masih jalan tetap terhitung dalam batas backpressure
+        _stats["in_flight"] -= 1
+        _stats["completed"] += 1
+        slots.release()
+
+    try:
+        future = _get_executor().submit(functools.partial(fn, *args, **kwargs))
+    except BaseException:
+        _done(None)
+        raise
+    future.add_done_callback(lambda f: loop.call_soon_threadsafe(_done, f))
+    return await asyncio.wrap_future(future)
+
+def shutdown() -> None:
+    global _executor, _slots
+    with _lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False)
+            _executor = None
+    _slots = None
+
+def get_stats() -> Dict:
+    return {**_stats, "workers": RETRIEVAL_WORKERS, "max_queue": RETRIEVAL_MAX_QUEUE}
@@ -0,0 +1,66 @@
+# backend/rag/core/http_client.py
+# Satu httpx.AsyncClient per proses untuk semua panggilan LLM keluar: koneksi (DNS/TCP/TLS)
+# dipakai ulang lewat pool keep-alive. Dibuka/ditutup oleh lifespan FastAPI (server/main.py).
+import os, logging
+from typing import Optional
+import httpx
+
+LLM_HTTP2 = os.getenv("LLM_HTTP2", "true").lower() == "true"
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "100"))
+LLM_MAX_KEEPALIVE = int(os.getenv("LLM_MAX_KEEPALIVE", "20"))
+LLM_KEEPALIVE_EXPIRY = float(os.getenv("LLM_KEEPALIVE_EXPIRY", "30"))
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "5"))
+LLM_READ_TIMEOUT = float(os.getenv("LLM_READ_TIMEOUT", "60"))
+LLM_WRITE_TIMEOUT = float(os.getenv("LLM_WRITE_TIMEOUT", "10"))
+LLM_POOL_TIMEOUT = float(os.getenv("LLM_POOL_TIMEOUT", "5"))
+
+log = logging.getLogger("http_client")
+log.setLevel(logging.INFO)
+
+_client: Optional[httpx.AsyncClient] = None
+
+def _http2_available() -> bool:
+    # HTTP/2 butuh paket h2 (pip install "httpx[http2]")
+    try:
+        import h2  # type: ignore  # noqa: F401
+        return True
+    except Exception:
+        return False
+
+def create_client(http2: Optional[bool] = None, **kwargs) -> httpx.AsyncClient:
+    http2 = LLM_HTTP2 if http2 is None else http2
+    if http2 and not _http2_available():
+        log.warning("h2 not installed, LLM client falls back to HTTP/1.1.")
+        http2 = False
+    return httpx.AsyncClient(
+        http2=http2,
+        limits=httpx.Limits(
+            max_connections=LLM_MAX_CONNECTIONS,
+            max_keepalive_connections=LLM_MAX_KEEPALIVE,
+            keepalive_expiry=LLM_KEEPALIVE_EXPIRY,
+        ),
+        timeout=httpx.Timeout(
+            connect=LLM_CONNECT_TIMEOUT, read=LLM_READ_TIMEOUT,
+            write=LLM_WRITE_TIMEOUT, pool=LLM_POOL_TIMEOUT,
+        ),
+        **kwargs,
+    )
+
+async def start() -> httpx.AsyncClient:
+    global _client
+    if _client is None or _client.is_closed:
+        _client = create_client()
+    return _client
+
+async def close() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+def get_client() -> httpx.AsyncClient:
+    """Client bersama; dibuat malas bila dipakai di luar lifespan (mis. skrip)."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = create_client()
+    return _client
@@ -0,0 +1,108 @@
+# backend/rag/core/index_manager.py
+# Hot reload index RAG: snapshot (BM25 + dense) versi baru dibangun di thread latar,
+# lalu ditukar atomik (satu assignment referensi). Request yang sedang jalan tetap
+# memakai snapshot lama sampai selesai; tidak perlu restart server setelah ingest.
+import os, time, logging, threading
+from typing import Callable, Dict, Optional
+from rag.core.index_store import current_index_key
+
+INDEX_WATCH_INTERVAL = float(os.getenv("INDEX_WATCH_INTERVAL", "5"))   # detik; 0 = watcher mati
+
+log = logging.getLogger("index_manager")
+log.setLevel(logging.INFO)
+
+class IndexManager:
+    def __init__(self, name: str, build: Callable[[tuple], object]):
+        self.name = name
+        self._build = build               # key (current_index_key) -> snapshot
+        self._snapshot = None
+        self._key: Optional[tuple] = None
+        self._lock = threading.Lock()     # satu build dalam satu waktu
+        self._building = False
+        self._status: Dict = {"version": None, "loaded_at": None, "build_seconds": None, "reloads": 0, "error": None}
+
+    def get(self):
+        """Snapshot aktif; build pertama dilakukan sinkron (belum ada yang bisa disajikan)."""
+        snapshot = self._snapshot
+        if snapshot is None:
+            self._run(force=False)
+            snapshot = self._snapshot
+            if snapshot is None:
+                raise RuntimeError(self._status["error"] or f"Index {self.name} belum tersedia")
+        return snapshot
+
+    @property
+    def key(self) -> Optional[tuple]:
+        return self._key
+
+    def is_stale(self) -> bool:
+        return self._key is not None and current_index_key() != self._key
+
+    def reload(self, wait: bool = False, force: bool = False) -> bool:
+        """Bangun ulang bila manifest berubah (atau `force`). True bila build dijadwalkan/dijalankan."""
+        if not force and not self.is_stale() and self._snapshot is not None:
+            return False
+        if wait:
+            self._run(force)
+        elif not self._building:
+            threading.Thread(target=self._run, args=(force,), name=f"index-reload-{self.name}", daemon=True).start()
+        return True
+
+    def _run(self, force: bool) -> None:
+        with self._lock:
+            key = current_index_key()
+            if not force and key == self._key and self._snapshot is not None:
+                return
+            self._building = True
+            start = time.perf_counter()
+            try:
+                snapshot = self._build(key)
+                # tukar atomik: pembaca melihat snapshot lama atau baru, tidak pernah setengah jadi
+                self._snapshot, self._key = snapshot, key
+                self._status.update(
+                    version=key[0], loaded_at=time.time(), build_seconds=time.perf_counter() - start,
+                    reloads=self._status["reloads"] + 1, error=None,
+                )
+                log.info("Index %s v%s loaded in %.2fs", self.name, key[0], self._status["build_seconds"])
+            except Exception as e:
+                # snapshot lama tetap dipakai
+                log.exception("Index %s reload failed", self.name)
+                self._status["error"] = str(e)
+            finally:
+                self._building = False
+
+    def get_status(self) -> Dict:
+        return {**self._status, "loaded": self._snapshot is not None, "building": self._building}
+
+# -------- registry & watcher --------
+_managers: Dict[str, IndexManager] = {}
+_watcher: Optional[threading.Thread] = None
+
+def register(name: str, build: Callable[[tuple], object]) -> IndexManager:
+    manager = IndexManager(name, build)
+    _managers[name] = manager
+    return manager
+
+def reload_all(wait: bool = False, force: bool = False) -> Dict[str, bool]:
+    # hanya index yang sudah pernah dimuat; sisanya dimuat saat query pertama
+    return {name: m.reload(wait=wait, force=force) for name, m in _managers.items() if m.key is not None}
+
+def get_status() -> Dict[str, Dict]:
+    return {name: m.get_status() for name, m in _managers.items()}
+
+def start_watcher(interval: float = INDEX_WATCH_INTERVAL) -> None:
+    """Thread latar yang memantau manifest.json dan memicu reload saat versi berubah."""
+    global _watcher
+    if interval <= 0 or (_watcher is not None and _watcher.is_alive()):
+        return
+
+    def _loop():
+        while True:
+            time.sleep(interval)
+            try:
+                reload_all()
+            except Exception as e:
+                log.warning("Index watcher error: %s", e)
+
+    _watcher = threading.Thread(target=_loop, name="index-watcher", daemon=True)
+    _watcher.start()
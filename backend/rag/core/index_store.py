@@ -0,0 +1,183 @@
+# backend/rag/core/index_store.py
+# Format index dense: matriks .npy tanpa kompresi, sudah dinormalisasi L2,
+# dibuka dengan mmap sehingga beberapa worker uvicorn berbagi page cache yang sama.
+import os, re, json, numpy as np
+from functools import lru_cache
+from typing import List, Dict, Optional, Tuple
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+STORAGE_DIR = os.path.join(ROOT, "storage")
+META_PATH = os.path.join(STORAGE_DIR, "meta.json")
+MINILM_INDEX_PATH = os.path.join(STORAGE_DIR, "index.npz")          # format lama (compressed)
+MINILM_MATRIX_PATH = os.path.join(STORAGE_DIR, "index_minilm.npy")   # format baru (normalized, mmap)
+MANIFEST_PATH = os.path.join(STORAGE_DIR, "manifest.json")          # versi index aktif (ditulis oleh ingest)
+BM25_PATH = os.path.join(STORAGE_DIR, "bm25.npz")                    # inverted index BM25 (CSR) per versi
+
+INDEX_DTYPE = os.getenv("INDEX_DTYPE", "float32")   # float32 | float16
+INDEX_KEEP_VERSIONS = int(os.getenv("INDEX_KEEP_VERSIONS", "2"))   # versi lama disimpan untuk pembaca yang masih jalan
+
+def normalize_rows(M: np.ndarray) -> np.ndarray:
+    M = np.asarray(M, dtype=np.float32)
+    return M / (np.linalg.norm(M, axis=1, keepdims=True) + 1e-8)
+
+def normalize_vector(q: np.ndarray) -> np.ndarray:
+    q = np.asarray(q, dtype=np.float32).reshape(-1)
+    return q / (np.linalg.norm(q) + 1e-8)
+
+def write_matrix(path: str, emb: np.ndarray, dtype: str = INDEX_DTYPE) -> None:
+    """Normalisasi lalu simpan atomik (tmp + rename) agar pembaca tidak melihat file setengah jadi."""
+    M = normalize_rows(emb).astype(dtype)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp.npy"
+    np.save(tmp, M)
+    os.replace(tmp, path)
+
+class MatrixWriter:
+    """Tulis matriks embedding per batch tanpa menampung seluruhnya di memori: baris dinormalisasi
+    ditulis ke file mentah sementara, lalu `close()` menyalinnya per blok ke .npy (atomik)."""
+
+    def __init__(self, path: str, dtype: str = INDEX_DTYPE):
+        self.path = path
+        self.dtype = np.dtype(dtype)
+        self.rows = 0
+        self.dim: Optional[int] = None
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._raw_path = path + ".tmp.raw"
+        self._raw = open(self._raw_path, "wb")
+
+    def append(self, emb: np.ndarray) -> None:
+        M = normalize_rows(emb).astype(self.dtype)
+        if self.dim is None:
+            self.dim = M.shape[1]
+        elif M.shape[1] != self.dim:
+            raise ValueError(f"Dimensi embedding berubah: {M.shape[1]} != {self.dim}")
+        self._raw.write(np.ascontiguousarray(M).tobytes())
+        self.rows += M.shape[0]
+
+    def close(self, block_rows: int = 65536) -> None:
+        self._raw.close()
+        tmp = self.path + ".tmp.npy"
+        out = np.lib.format.open_memmap(tmp, mode="w+", dtype=self.dtype, shape=(self.rows, self.dim or 0))
+        if self.rows:
+            src = np.memmap(self._raw_path, dtype=self.dtype, mode="r", shape=(self.rows, self.dim))
+            for start in range(0, self.rows, block_rows):
+                out[start:start + block_rows] = src[start:start + block_rows]
+            del src
+        out.flush()
+        del out
+        os.remove(self._raw_path)
+        os.replace(tmp, self.path)
+
+    def abort(self) -> None:
+        self._raw.close()
+        if os.path.exists(self._raw_path):
+            os.remove(self._raw_path)
+
+    def __enter__(self) -> "MatrixWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+def load_matrix(path: str) -> Optional[np.ndarray]:
+    if not os.path.exists(path):
+        return None
+    return np.load(path, mmap_mode="r")   # np.memmap, read-only
+
+def load_or_convert_minilm() -> Optional[np.ndarray]:
+    """Buka index_minilm.npy; bila belum ada, konversi sekali dari index.npz lama."""
+    M = load_matrix(MINILM_MATRIX_PATH)
+    if M is not None:
+        return M
+    if not os.path.exists(MINILM_INDEX_PATH):
+        return None
+    write_matrix(MINILM_MATRIX_PATH, np.load(MINILM_INDEX_PATH)["embeddings"])
+    return load_matrix(MINILM_MATRIX_PATH)
+
+def write_meta(path: str, docs: List[Dict]) -> None:
+    meta = {}
+    for i, d in enumerate(docs):
+        meta[str(i)] = {"text": d["text"], "source": d["source"]}
+        if "hash" in d:
+            meta[str(i)]["hash"] = d["hash"]
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+
+def load_meta(path: str = META_PATH) -> List[Dict]:
+    with open(path, "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    return [meta[str(i)] for i in range(len(meta))]
+
+def file_stamp(*paths: str) -> tuple:
+    # (mtime, size) per file; berubah setiap kali ingest menulis ulang index
+    out = []
+    for p in paths:
+        try:
+            st = os.stat(p)
+            out.append((st.st_mtime_ns, st.st_size))
+        except OSError:
+            out.append(None)
+    return tuple(out)
+
+def cosine_scores(q: np.ndarray, M: np.ndarray) -> np.ndarray:
+    # M sudah ternormalisasi: cukup satu matvec
+    q = normalize_vector(q).astype(M.dtype, copy=False)
+    return np.asarray(M @ q, dtype=np.float32)
+
+# -------- manifest & versi index --------
+def versioned_path(path: str, version: int) -> str:
+    # index_minilm.npy -> index_minilm.v3.npy; versi 0 = file lama tanpa manifest
+    if not version:
+        return path
+    root, ext = os.path.splitext(path)
+    return f"{root}.v{version}{ext}"
+
+def read_manifest() -> Optional[Dict]:
+    try:
+        with open(MANIFEST_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def write_manifest(manifest: Dict) -> None:
+    # ditulis terakhir (atomik) sehingga pembaca selalu melihat matriks + meta yang lengkap
+    tmp = MANIFEST_PATH + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, MANIFEST_PATH)
+
+@lru_cache(maxsize=1)
+def _current_index(stamp: tuple) -> Tuple[int, str, str]:
+    manifest = read_manifest()
+    if not manifest:
+        return 0, MINILM_MATRIX_PATH, META_PATH
+    version = int(manifest["version"])
+    return version, versioned_path(MINILM_MATRIX_PATH, version), versioned_path(META_PATH, version)
+
+def current_index() -> Tuple[int, str, str]:
+    """(versi, path matriks MiniLM, path meta) yang aktif; cukup satu os.stat per panggilan."""
+    return _current_index(file_stamp(MANIFEST_PATH))
+
+def current_index_key() -> tuple:
+    # kunci cache untuk pembaca; file lama (versi 0) bisa ditimpa manual, jadi ikutkan stamp-nya
+    version, matrix_path, meta_path = current_index()
+    return (version, matrix_path, meta_path) + (() if version else file_stamp(matrix_path, meta_path))
+
+def load_index_matrix(path: str) -> Optional[np.ndarray]:
+    return load_or_convert_minilm() if path == MINILM_MATRIX_PATH else load_matrix(path)
+
+def prune_versions(keep_from: int) -> None:
+    """Hapus file index dengan versi < keep_from (matriks, meta, index ANN, cache BGE)."""
+    pattern = re.compile(r"\.v(\d+)\.")
+    for name in os.listdir(STORAGE_DIR):
+        m = pattern.search(name)
+        if m and int(m.group(1)) < keep_from:
+            try:
+                os.remove(os.path.join(STORAGE_DIR, name))
+            except OSError:
+                pass
@@ -0,0 +1,169 @@
+# backend/rag/core/ingestion.py
+# Ingest inkremental: hash per file + hash per chunk. Hanya chunk baru/berubah yang di-embed,
+# chunk dari file yang dihapus/berubah ikut hilang, lalu ditulis sebagai versi index baru
+# (index_minilm.vN.npy + meta.vN.json + bm25.vN.npz) dan manifest.json dialihkan ke versi itu.
+# Alurnya pipeline generator: file (dibaca per baris) -> chunk -> batch embedding -> penulis matriks,
+# sehingga memori embedding hanya sebesar satu batch.
+import os, hashlib, logging, threading, numpy as np
+from itertools import islice
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from rag.core import embeddings
+from rag.core.settings import settings
+from rag.core.textsplit import simple_chunk, markdown_chunk, CHUNK_TOKENS
+from rag.core.index_store import (
+    MINILM_MATRIX_PATH, META_PATH, BM25_PATH, INDEX_KEEP_VERSIONS, MatrixWriter, write_meta, load_meta, load_matrix,
+    load_index_matrix, read_manifest, write_manifest, current_index, versioned_path, prune_versions,
+)
+from rag.core.vector_index import build_index, VECTOR_INDEX
+from rag.core.bm25 import BM25Index
+
+CHUNKER = os.getenv("CHUNKER", "markdown")           # markdown | simple
+CHUNK_SIZE = 800                                     # karakter, untuk CHUNKER=simple
+CHUNK_OVERLAP = 100
+EMBED_BATCH = int(os.getenv("EMBED_BATCH", "64"))    # chunk per panggilan encode
+
+log = logging.getLogger("ingestion")
+log.setLevel(logging.INFO)
+
+_lock = threading.Lock()   # satu ingest per proses
+
+def file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def chunk_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def chunker_config() -> Dict:
+    # dicatat di manifest; bila berubah, semua file dipotong ulang pada ingest berikutnya
+    if CHUNKER == "simple":
+        return {"kind": "simple", "size": CHUNK_SIZE, "overlap": CHUNK_OVERLAP}
+    return {"kind": "markdown", "max_tokens": CHUNK_TOKENS}
+
+def chunk_file(path: str) -> Iterator[str]:
+    with open(path, "r", encoding="utf-8") as f:
+        if CHUNKER == "simple":
+            chunks = simple_chunk(f.read(), chunk_size=CHUNK_SIZE, overlap=CHUNK_OVERLAP)
+        else:
+            chunks = markdown_chunk(f, max_tokens=CHUNK_TOKENS)   # file dibaca per baris
+        for ch in chunks:
+            if ch.strip():
+                yield ch
+
+def _batched(items: Iterable[Dict], size: int) -> Iterator[List[Dict]]:
+    it = iter(items)
+    while batch := list(islice(it, size)):
+        yield batch
+
+def embed_batches(docs: Iterable[Dict], prev_docs: List[Dict], prev_M: Optional[np.ndarray],
+                  encode: Callable[[List[str]], np.ndarray],
+                  batch_size: int = EMBED_BATCH) -> Iterator[Tuple[List[Dict], np.ndarray, int]]:
+    """(batch chunk, embedding-nya, jumlah yang baru di-encode): baris lama dipakai ulang per hash chunk."""
+    prev_rows: Dict[str, int] = {}
+    if prev_M is not None and len(prev_docs) == prev_M.shape[0]:
+        for i, d in enumerate(prev_docs):
+            prev_rows.setdefault(d.get("hash") or chunk_hash(d["text"]), i)
+
+    for batch in _batched(docs, batch_size):
+        missing = list(dict.fromkeys(d["hash"] for d in batch if d["hash"] not in prev_rows))
+        by_hash = {d["hash"]: d["text"] for d in batch}
+        new_vecs = encode([by_hash[h] for h in missing]) if missing else None
+        new_rows = {h: j for j, h in enumerate(missing)}
+
+        dim = new_vecs.shape[1] if new_vecs is not None else prev_M.shape[1]
+        M = np.empty((len(batch), dim), dtype=np.float32)
+        for i, d in enumerate(batch):
+            h = d["hash"]
+            M[i] = new_vecs[new_rows[h]] if h in new_rows else prev_M[prev_rows[h]]
+        yield batch, M, len(missing)
+
+def write_embeddings(path: str, docs: Iterable[Dict], prev_docs: List[Dict], prev_M: Optional[np.ndarray],
+                     encode: Callable[[List[str]], np.ndarray]) -> List[Dict]:
+    """Jalankan pipeline embedding sampai habis dan tulis matriksnya ke `path`; kembalikan chunk yang ditulis."""
+    out: List[Dict] = []
+    encoded = 0
+    with MatrixWriter(path) as writer:
+        for batch, M, n_new in embed_batches(docs, prev_docs, prev_M, encode):
+            writer.append(M)
+            out.extend(batch)
+            encoded += n_new
+    log.info("Embedded %d new chunk(s), reused %d.", encoded, len(out) - encoded)
+    return out
+
+def ingest_paths(paths: List[str]) -> Dict:
+    with _lock:
+        return _ingest(paths)
+
+def _iter_chunks(plan: List[Tuple], prev_by_source: Dict[str, List[Dict]], files: Dict[str, Dict]) -> Iterator[Dict]:
+    # tahap pertama pipeline: chunk per file, dari index lama (file tidak berubah) atau dipotong ulang
+    for path, source, digest, reuse in plan:
+        if reuse:
+            texts = (d["text"] for d in prev_by_source.get(source, []))
+        else:
+            texts = chunk_file(path)
+        n = 0
+        for text in texts:
+            n += 1
+            yield {"text": text, "source": source, "hash": chunk_hash(text)}
+        files[source] = {"sha256": digest, "chunks": n}
+
+def _ingest(paths: List[str]) -> Dict:
+    manifest = read_manifest() or {"version": 0, "files": {}}
+    version, prev_matrix_path, prev_meta_path = current_index()
+    prev_docs = load_meta(prev_meta_path) if os.path.exists(prev_meta_path) else []
+    prev_M = load_index_matrix(prev_matrix_path)
+    if manifest.get("emb_model", settings.EMBEDDING_MODEL) != settings.EMBEDDING_MODEL:
+        # model embedding berganti: tidak ada baris lama yang boleh dipakai ulang
+        prev_docs, prev_M = [], None
+    rechunk = manifest.get("chunker") != chunker_config()
+
+    prev_by_source: Dict[str, List[Dict]] = {}
+    for d in prev_docs:
+        prev_by_source.setdefault(d["source"], []).append(d)
+
+    plan = []
+    changed = []
+    for p in paths:
+        source = os.path.basename(p)
+        digest = file_sha256(p)
+        old = manifest["files"].get(source)
+        # file tanpa chunk (kosong / hanya heading) memang tidak punya baris di meta lama
+        reuse = bool(old and old["sha256"] == digest and not rechunk
+                     and (source in prev_by_source or old.get("chunks") == 0))
+        if not reuse:
+            changed.append(source)
+        plan.append((p, source, digest, reuse))
+
+    removed = sorted(set(manifest["files"]) - {source for _, source, _, _ in plan}) if version else []
+    if version and not changed and not removed:
+        chunks = sum(len(prev_by_source.get(source, [])) for _, source, _, _ in plan)
+        return {"ok": True, "version": version, "chunks": chunks, "changed": [], "removed": []}
+
+    new_version = int(manifest.get("version", 0)) + 1
+    matrix_path = versioned_path(MINILM_MATRIX_PATH, new_version)
+    files: Dict[str, Dict] = {}
+    docs = write_embeddings(matrix_path, _iter_chunks(plan, prev_by_source, files), prev_docs, prev_M,
+                            embeddings.encode_minilm)
+    if not docs:
+        os.remove(matrix_path)
+        return {"ok": False, "error": "Tidak ada dokumen untuk di-index."}
+
+    write_meta(versioned_path(META_PATH, new_version), docs)
+    index = build_index(matrix_path, load_matrix(matrix_path), VECTOR_INDEX)
+    BM25Index.build([d["text"] for d in docs]).save(versioned_path(BM25_PATH, new_version))
+    write_manifest({
+        "version": new_version,
+        "emb_model": settings.EMBEDDING_MODEL,
+        "chunker": chunker_config(),
+        "vector_index": index.kind,
+        "files": files,
+    })
+    prune_versions(new_version - INDEX_KEEP_VERSIONS + 1)
+    log.info("Index v%d: %d chunk(s), changed=%s removed=%s", new_version, len(docs), changed, removed)
+    return {
+        "ok": True, "version": new_version, "chunks": len(docs), "changed": changed, "removed": removed,
+        "vector_index": index.kind,
+    }
@@ -1,23 +1,50 @@
-import httpx, os
-from app.core.settings import settings
+import os
+from typing import AsyncIterator
+from rag.core.settings import settings
+from rag.core.http_client import get_client
+from rag.core.sse import iter_sse_data
 
-BASE_URL = "https://openrouter.ai/api/v1"
+BASE_URL = os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1")
 
-async def openrouter_chat(messages: list[dict], temperature: float = 0.2) -> str:
+def _headers() -> dict:
     if not settings.OPENROUTER_API_KEY:
         raise RuntimeError("OPENROUTER_API_KEY is not set")
-    headers = {
+    return {
         "Authorization": f"Bearer {settings.OPENROUTER_API_KEY}",
         "HTTP-Referer": "kai-helper-chatbot",
         "X-Title": "kai-helper-chatbot",
     }
+
+async def openrouter_chat(messages: list[dict], temperature: float = 0.2) -> str:
+    headers = _headers()
+    payload = {
+        "model": settings.OPENROUTER_MODEL,
+        "messages": messages,
+        "temperature": temperature,
+    }
+    r = await get_client().post(f"{BASE_URL}/chat/completions", json=payload, headers=headers)
+    r.raise_for_status()
+    data = r.json()
+    return data["choices"][0]["message"]["content"]
+
+async def openrouter_chat_stream(messages: list[dict], temperature: float = 0.2) -> AsyncIterator[str]:
+    """Sama seperti openrouter_chat, tetapi menghasilkan potongan teks begitu diterima (stream SSE)."""
+    headers = _headers()
     payload = {
         "model": settings.OPENROUTER_MODEL,
         "messages": messages,
         "temperature": temperature,
+        "stream": True,
     }
-    async with httpx.AsyncClient(base_url=BASE_URL, timeout=60) as client:
-        r = await client.post("/chat/completions", json=payload, headers=headers)
-        r.raise_for_status()
-        data = r.json()
-        return data["choices"][0]["message"]["content"]
+    async with get_client().stream("POST", f"{BASE_URL}/chat/completions", json=payload, headers=headers) as r:
+        if r.status_code >= 400:
+            await r.aread()
+            r.raise_for_status()
+        async for chunk in iter_sse_data(r):
+            if "error" in chunk:
+                err = chunk["error"]
+                raise RuntimeError(err.get("message", "OpenRouter stream error") if isinstance(err, dict) else str(err))
+            for choice in chunk.get("choices", []):
+                content = (choice.get("delta") or {}).get("content")
+                if content:
+                    yield content
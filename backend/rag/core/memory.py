@@ -1,28 +1,201 @@
 # app/core/memory.py
-import os
-from collections import deque
-from typing import List, Dict
+# Memori percakapan pendek per sesi:
+# - batas jumlah sesi (MEMORY_MAX_SESSIONS, LRU) dan TTL idle (MEMORY_TTL) supaya tidak tumbuh terus
+# - riwayat yang dikirim ke LLM dipangkas dengan budget token (MEMORY_TOKEN_BUDGET)
+# - backend pluggable: memory (per proses), sqlite (file bersama antar worker), redis (server Redis-compatible)
+import os, json, time, sqlite3, threading
+from collections import OrderedDict, deque
+from typing import List, Dict, Optional
+from rag.core.index_store import STORAGE_DIR
+from rag.core.context import trim_messages
 
 MAX_MSG = int(os.getenv("MEMORY_MAX_MESSAGES", "12"))  # jumlah pesan disimpan per sesi
+MEMORY_BACKEND = os.getenv("MEMORY_BACKEND", "memory")              # memory | sqlite | redis
+MEMORY_MAX_SESSIONS = int(os.getenv("MEMORY_MAX_SESSIONS", "10000"))
+MEMORY_TTL = float(os.getenv("MEMORY_TTL", str(6 * 3600)))         # detik sejak aktivitas terakhir
+MEMORY_TOKEN_BUDGET = int(os.getenv("MEMORY_TOKEN_BUDGET", "1500"))
+MEMORY_SQLITE_PATH = os.getenv("MEMORY_SQLITE_PATH", os.path.join(STORAGE_DIR, "memory.sqlite3"))
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")      # fakeredis:// = stand-in lokal (pip install fakeredis)
 
-class MemoryStore:
-    def __init__(self, max_messages: int = MAX_MSG):
-        self.store: Dict[str, deque] = {}
+# -------- backends --------
+class InProcessBackend:
+    def __init__(self, max_messages: int, max_sessions: int, ttl: float):
+        self.max_messages = max_messages
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self._sessions: "OrderedDict[str, tuple]" = OrderedDict()   # urut dari yang paling lama idle
+        self._lock = threading.Lock()
+
+    def _evict(self, now: float) -> None:
+        while self._sessions:
+            sid, (last_seen, _) = next(iter(self._sessions.items()))
+            if now - last_seen <= self.ttl and len(self._sessions) <= self.max_sessions:
+                break
+            self._sessions.popitem(last=False)
+
+    def append(self, session_id: str, message: Dict) -> None:
+        now = time.time()
+        with self._lock:
+            _, q = self._sessions.pop(session_id, (now, None))
+            q = q if q is not None else deque(maxlen=self.max_messages)
+            q.append(message)
+            self._sessions[session_id] = (now, q)
+            self._evict(now)
+
+    def get(self, session_id: str) -> List[Dict]:
+        now = time.time()
+        with self._lock:
+            self._evict(now)
+            item = self._sessions.get(session_id)
+            return list(item[1]) if item else []
+
+    def clear(self, session_id: str) -> None:
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def size(self) -> int:
+        return len(self._sessions)
+
+class SQLiteBackend:
+    def __init__(self, path: str, max_messages: int, max_sessions: int, ttl: float):
+        self.max_messages = max_messages
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=5)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")   # beberapa worker membaca/menulis bersamaan
+            self._conn.execute("CREATE TABLE IF NOT EXISTS sessions (id TEXT PRIMARY KEY, last_seen REAL NOT NULL)")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS messages (seq INTEGER PRIMARY KEY AUTOINCREMENT, "
+                "session_id TEXT NOT NULL, role TEXT NOT NULL, content TEXT NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS messages_session ON messages (session_id, seq)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS sessions_last_seen ON sessions (last_seen)")
+
+    def _delete_sessions(self, where: str, args: tuple) -> None:
+        self._conn.execute(f"DELETE FROM messages WHERE session_id IN (SELECT id FROM sessions WHERE {where})", args)
+        self._conn.execute(f"DELETE FROM sessions WHERE {where}", args)
+
+    def append(self, session_id: str, message: Dict) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute(
+                    "INSERT INTO sessions (id, last_seen) VALUES (?, ?) ON CONFLICT(id) DO UPDATE SET last_seen = excluded.last_seen",
+                    (session_id, now),
+                )
+                self._conn.execute(
+                    "INSERT INTO messages (session_id, role, content) VALUES (?, ?, ?)",
+                    (session_id, message["role"], message["content"]),
+                )
+                self._conn.execute(
+                    "DELETE FROM messages WHERE session_id = ? AND seq NOT IN "
+                    "(SELECT seq FROM messages WHERE session_id = ? ORDER BY seq DESC LIMIT ?)",
+                    (session_id, session_id, self.max_messages),
+                )
+                self._delete_sessions("last_seen < ?", (now - self.ttl,))
+                self._delete_sessions(
+                    "id IN (SELECT id FROM sessions ORDER BY last_seen DESC LIMIT -1 OFFSET ?)", (self.max_sessions,)
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def get(self, session_id: str) -> List[Dict]:
+        with self._lock:
+            row = self._conn.execute("SELECT last_seen FROM sessions WHERE id = ?", (session_id,)).fetchone()
+            if row is None or time.time() - row[0] > self.ttl:
+                return []
+            rows = self._conn.execute(
+                "SELECT role, content FROM messages WHERE session_id = ? ORDER BY seq", (session_id,)
+            ).fetchall()
+        return [{"role": r, "content": c} for r, c in rows]
+
+    def clear(self, session_id: str) -> None:
+        with self._lock:
+            self._delete_sessions("id = ?", (session_id,))
+
+    def size(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+class RedisBackend:
+    PREFIX = "kai:memory:"
+
+    def __init__(self, url: str, max_messages: int, max_sessions: int, ttl: float):
         self.max_messages = max_messages
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        if url.startswith("fakeredis://"):
+            import fakeredis  # type: ignore
+            self._r = fakeredis.FakeRedis(decode_responses=True)
+        else:
+            import redis  # type: ignore
+            self._r = redis.Redis.from_url(url, decode_responses=True)
+        self._index = self.PREFIX + "sessions"   # sorted set: session -> last_seen
+
+    def append(self, session_id: str, message: Dict) -> None:
+        now = time.time()
+        key = self.PREFIX + session_id
+        pipe = self._r.pipeline()
+        pipe.rpush(key, json.dumps(message, ensure_ascii=False))
+        pipe.ltrim(key, -self.max_messages, -1)
+        pipe.expire(key, int(self.ttl))
+        pipe.zadd(self._index, {session_id: now})
+        pipe.zremrangebyscore(self._index, "-inf", now - self.ttl)
+        pipe.execute()
+        # batas jumlah sesi: buang yang paling lama idle
+        excess = self._r.zcard(self._index) - self.max_sessions
+        if excess > 0:
+            for sid, _ in self._r.zpopmin(self._index, excess):
+                self._r.delete(self.PREFIX + sid)
+
+    def get(self, session_id: str) -> List[Dict]:
+        return [json.loads(m) for m in self._r.lrange(self.PREFIX + session_id, 0, -1)]
+
+    def clear(self, session_id: str) -> None:
+        self._r.delete(self.PREFIX + session_id)
+        self._r.zrem(self._index, session_id)
+
+    def size(self) -> int:
+        return int(self._r.zcard(self._index))
+
+def create_backend(kind: str = MEMORY_BACKEND):
+    if kind == "sqlite":
+        return SQLiteBackend(MEMORY_SQLITE_PATH, MAX_MSG, MEMORY_MAX_SESSIONS, MEMORY_TTL)
+    if kind == "redis":
+        return RedisBackend(REDIS_URL, MAX_MSG, MEMORY_MAX_SESSIONS, MEMORY_TTL)
+    return InProcessBackend(MAX_MSG, MEMORY_MAX_SESSIONS, MEMORY_TTL)
+
+# -------- store --------
+class MemoryStore:
+    def __init__(self, backend=None, token_budget: int = MEMORY_TOKEN_BUDGET):
+        self.backend = backend if backend is not None else create_backend()
+        self.token_budget = token_budget
 
     def append(self, session_id: str, role: str, content: str):
         if not session_id:
             return
-        q = self.store.setdefault(session_id, deque(maxlen=self.max_messages))
-        q.append({"role": role, "content": content})
+        self.backend.append(session_id, {"role": role, "content": content})
 
-    def get(self, session_id: str) -> List[Dict]:
+    def get(self, session_id: str, token_budget: Optional[int] = None) -> List[Dict]:
+        """Riwayat terbaru yang muat dalam budget token (pesan lama dibuang lebih dulu)."""
         if not session_id:
             return []
-        return list(self.store.get(session_id, []))
+        budget = self.token_budget if token_budget is None else token_budget
+        return trim_messages(self.backend.get(session_id), budget)
 
     def clear(self, session_id: str):
-        if session_id in self.store:
-            del self.store[session_id]
+        self.backend.clear(session_id)
+
+    def get_stats(self) -> Dict:
+        return {
+            "backend": type(self.backend).__name__, "sessions": self.backend.size(),
+            "max_sessions": MEMORY_MAX_SESSIONS, "ttl": MEMORY_TTL, "token_budget": self.token_budget,
+        }
 
-memory = MemoryStore()
\ No newline at end of file
+memory = MemoryStore()
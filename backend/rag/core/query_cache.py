@@ -0,0 +1,82 @@
+# backend/rag/core/query_cache.py
+# Cache LRU in-process untuk query chat yang berulang ("jadwal kereta", "cara refund"):
+#   query -> embedding   (kunci: nama model + query dengan spasi dirapikan; huruf besar/kecil dipertahankan)
+#   query -> hasil top-k (kunci: versi index + query yang sama dengan kunci embedding + k; ingest baru = versi baru)
+import os, threading, numpy as np
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, List, Optional
+
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "1024"))   # 0 = nonaktif
+
+def normalize_query(query: str) -> str:
+    # "Jadwal  Kereta " dan "jadwal kereta" dianggap sama
+    return " ".join(query.casefold().split())
+
+def _embedding_key(query: str) -> str:
+    # tanpa casefold: model cased (BGE-M3) menghasilkan vektor berbeda untuk "KRL" dan "krl"
+    return " ".join(query.split())
+
+class LRUCache:
+    def __init__(self, max_size: int = QUERY_CACHE_SIZE):
+        self.max_size = max_size
+        self._items: "OrderedDict[Hashable, object]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable):
+        with self._lock:
+            if key not in self._items:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return self._items[key]
+
+    def put(self, key: Hashable, value) -> None:
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {"size": len(self._items), "max_size": self.max_size, "hits": self.hits,
+                    "misses": self.misses, "hit_rate": self.hits / total if total else 0.0}
+
+_embeddings = LRUCache()
+_results = LRUCache()
+
+def cached_embedding(model_key: str, query: str, encode: Callable[[str], np.ndarray]) -> np.ndarray:
+    key = (model_key, _embedding_key(query))
+    vec: Optional[np.ndarray] = _embeddings.get(key)
+    if vec is None:
+        vec = np.asarray(encode(query), dtype=np.float32).reshape(-1)
+        vec.setflags(write=False)   # dibagi antar request, jangan diubah
+        _embeddings.put(key, vec)
+    return vec
+
+def cached_hits(namespace: str, version: Hashable, query: str, k: int, search: Callable[[], List[Dict]]) -> List[Dict]:
+    # kunci query sama dengan cache embedding: hasil top-k selalu milik vektor yang menghasilkannya
+    key = (namespace, version, _embedding_key(query), k)
+    hits: Optional[List[Dict]] = _results.get(key)
+    if hits is None:
+        hits = search()
+        _results.put(key, hits)
+    # salinan dangkal agar pemanggil bebas mengubah dict hasil
+    return [dict(h) for h in hits]
+
+def clear() -> None:
+    _embeddings.clear()
+    _results.clear()
+
+def get_stats() -> Dict:
+    return {"embeddings": _embeddings.stats(), "results": _results.stats()}
@@ -0,0 +1,137 @@
+# backend/rag/core/response_cache.py
+# Cache jawaban LLM untuk pertanyaan yang berulang ("cara refund tiket", "jam operasional loket"):
+#   kunci  = (scope: model + parameter generasi, versi index, model embedding, id chunk hasil retrieval)
+#   cocok  = cosine embedding query (vektor yang sama dengan retriever) >= RESPONSE_CACHE_THRESHOLD
+# Entri kedaluwarsa setelah RESPONSE_CACHE_TTL detik dan seluruh cache dibuang saat versi index berganti.
+import os, time, hashlib, logging, threading, numpy as np
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Dict, Hashable, List, Optional, Tuple
+from rag.core.index_store import current_index_key, normalize_vector
+from rag.core.query_cache import normalize_query
+
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "512"))          # 0 = nonaktif
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "3600"))         # detik
+RESPONSE_CACHE_THRESHOLD = float(os.getenv("RESPONSE_CACHE_THRESHOLD", "0.92"))
+
+log = logging.getLogger("response_cache")
+
+@dataclass(frozen=True)
+class CacheKey:
+    bucket: tuple          # (scope, versi index, model embedding, id chunk)
+    query: str             # query ternormalisasi
+    vector: np.ndarray     # embedding query, L2 = 1
+
+@dataclass
+class _Entry:
+    vector: np.ndarray
+    value: object
+    created: float
+
+def _hit_id(h: Dict) -> Hashable:
+    # retrieval hybrid punya id baris; retrieval basic cukup dikenali dari isi chunk
+    if "id" in h:
+        return (h["source"], int(h["id"]))
+    return (h["source"], hashlib.sha1(h["text"].encode("utf-8")).hexdigest()[:16])
+
+def make_key(query: str, hits: List[Dict], scope: tuple,
+             query_vector: Callable[[str], Optional[Tuple[str, np.ndarray]]]) -> Optional[CacheKey]:
+    """Kunci cache untuk query + hasil retrieval-nya; None bila cache nonaktif atau tidak ada embedding.
+    `query_vector` = fungsi dari retriever aktif (BGE-M3 / MiniLM), dipanggil di thread retrieval
+    setelah pencarian sehingga vektornya diambil dari query_cache, tanpa encode tambahan."""
+    if RESPONSE_CACHE_SIZE <= 0 or not hits:
+        return None
+    try:
+        dense = query_vector(query)
+    except Exception as e:
+        log.debug("Response cache bypassed (%s).", e)
+        return None
+    if dense is None:
+        return None
+    model, vec = dense
+    ids = tuple(sorted(_hit_id(h) for h in hits))
+    return CacheKey((scope, current_index_key(), model, ids), normalize_query(query), normalize_vector(vec))
+
+class ResponseCache:
+    def __init__(self, max_size: int = RESPONSE_CACHE_SIZE, ttl: float = RESPONSE_CACHE_TTL,
+                 threshold: float = RESPONSE_CACHE_THRESHOLD):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.threshold = threshold
+        self._buckets: Dict[tuple, Dict[str, _Entry]] = {}
+        self._order: "OrderedDict[Tuple[tuple, str], None]" = OrderedDict()   # LRU lintas bucket
+        self._index_key: Optional[tuple] = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _check_version(self, index_key: tuple) -> None:
+        # semua kunci memuat versi index aktif; versi baru = jawaban lama tidak lagi valid
+        if index_key != self._index_key:
+            self._buckets.clear()
+            self._order.clear()
+            self._index_key = index_key
+
+    def _drop(self, bucket: tuple, query: str) -> None:
+        entries = self._buckets.get(bucket)
+        if entries is not None:
+            entries.pop(query, None)
+            if not entries:
+                del self._buckets[bucket]
+        self._order.pop((bucket, query), None)
+
+    def get(self, key: Optional[CacheKey]) -> Optional[Tuple[object, float]]:
+        """(nilai tersimpan, similarity) untuk query yang cukup mirip, atau None."""
+        if key is None:
+            return None
+        now = time.time()
+        with self._lock:
+            self._check_version(key.bucket[1])
+            entries = self._buckets.get(key.bucket, {})
+            for q in [q for q, e in entries.items() if now - e.created > self.ttl]:
+                self._drop(key.bucket, q)
+            entries = self._buckets.get(key.bucket)
+            if not entries:
+                self.misses += 1
+                return None
+            if key.query in entries:
+                best, score = key.query, 1.0
+            else:
+                names = list(entries)
+                sims = np.stack([entries[q].vector for q in names]) @ key.vector
+                i = int(np.argmax(sims))
+                best, score = names[i], float(sims[i])
+            if score < self.threshold:
+                self.misses += 1
+                return None
+            self._order.move_to_end((key.bucket, best))
+            self.hits += 1
+            return entries[best].value, score
+
+    def put(self, key: Optional[CacheKey], value: object) -> None:
+        if key is None or self.max_size <= 0:
+            return
+        with self._lock:
+            self._check_version(key.bucket[1])
+            self._buckets.setdefault(key.bucket, {})[key.query] = _Entry(key.vector, value, time.time())
+            self._order[(key.bucket, key.query)] = None
+            self._order.move_to_end((key.bucket, key.query))
+            while len(self._order) > self.max_size:
+                self._drop(*next(iter(self._order)))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._buckets.clear()
+            self._order.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {"size": len(self._order), "max_size": self.max_size, "ttl": self.ttl,
+                    "threshold": self.threshold, "hits": self.hits, "misses": self.misses,
+                    "hit_rate": self.hits / total if total else 0.0}
+
+response_cache = ResponseCache()
+
+def get_stats() -> Dict:
+    return response_cache.stats()
@@ -1,30 +1,31 @@
 # app/core/retrieval_hybrid.py
 # Hybrid retrieval: BGE-M3 (dense, jika tersedia) + BM25 (lexical) + fallback ke MiniLM index lama
-import os, json, numpy as np, logging
-from functools import lru_cache
-from typing import List, Dict
-from rank_bm25 import BM25Okapi
-
-ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
-STORAGE_DIR = os.path.join(ROOT, "storage")
-META_PATH = os.path.join(STORAGE_DIR, "meta.json")
-MINILM_INDEX_PATH = os.path.join(STORAGE_DIR, "index.npz")        # dari pipeline lama
-BGE_CACHE = os.path.join(STORAGE_DIR, "bge_m3_index.npz")         # cache dense BGE-M3
+import os, re, numpy as np, logging
+from dataclasses import dataclass
+from typing import List, Dict, Optional
+from rag.core.index_store import (
+    STORAGE_DIR, META_PATH, BM25_PATH, load_meta, load_matrix, load_index_matrix, cosine_scores,
+    versioned_path,
+)
+from rag.core import index_manager
+from rag.core import bm25
+from rag.core.ingestion import chunk_hash, write_embeddings
+from rag.core.query_cache import cached_embedding, cached_hits
+from rag.core import embeddings
+from rag.core.vector_index import load_index, build_index, top_k as _top_k
+
+BGE_CACHE = os.path.join(STORAGE_DIR, "index_bge_m3.npy")         # cache dense BGE-M3 (normalized, mmap; per versi index)
 
 ALPHA = float(os.getenv("HYBRID_ALPHA", "0.65"))
+FUSION = os.getenv("HYBRID_FUSION", "alpha")                      # alpha | rrf
+RRF_K = int(os.getenv("RRF_K", "60"))
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "64"))    # top-M kandidat per retriever (dense & BM25)
 TOP_K_DEFAULT = int(os.getenv("TOP_K", "8"))
 
 log = logging.getLogger("hybrid")
 log.setLevel(logging.INFO)
 
 # -------- util --------
-def _cosine_sim(q: np.ndarray, M: np.ndarray) -> np.ndarray:
-    q = q.astype(np.float32)
-    M = M.astype(np.float32)
-    q /= (np.linalg.norm(q) + 1e-8)
-    M /= (np.linalg.norm(M, axis=1, keepdims=True) + 1e-8)
-    return M @ q
-
 def _minmax(x: np.ndarray) -> np.ndarray:
     if x.size == 0:
         return x
@@ -33,143 +34,173 @@ def _minmax(x: np.ndarray) -> np.ndarray:
         return np.zeros_like(x)
     return (x - mn) / (mx - mn)
 
-# -------- corpus/meta --------
-@lru_cache(maxsize=1)
-def _load_meta() -> Dict[str, Dict]:
-    if not os.path.exists(META_PATH):
-        raise RuntimeError("meta.json tidak ditemukan. Jalankan `python scripts/ingest.py` dulu.")
-    with open(META_PATH, "r", encoding="utf-8") as f:
-        return json.load(f)
-
-@lru_cache(maxsize=1)
-def _load_corpus() -> List[str]:
-    meta = _load_meta()
-    items = [meta[str(i)] for i in range(len(meta))]
-    return [it["text"] for it in items]
+def _lookup(ids: np.ndarray, scores: np.ndarray, cand: np.ndarray) -> np.ndarray:
+    # skor sparse (ids terurut) untuk kandidat; dokumen tanpa term query = 0
+    out = np.zeros(cand.size, dtype=np.float32)
+    if ids.size:
+        pos = np.minimum(np.searchsorted(ids, cand), ids.size - 1)
+        hit = ids[pos] == cand
+        out[hit] = scores[pos[hit]]
+    return out
 
-@lru_cache(maxsize=1)
-def _load_sources() -> List[str]:
-    meta = _load_meta()
-    items = [meta[str(i)] for i in range(len(meta))]
-    return [it["source"] for it in items]
+def _ranks(x: np.ndarray) -> np.ndarray:
+    # peringkat 1..n, 1 = skor tertinggi
+    r = np.empty(x.size, dtype=np.float32)
+    r[np.argsort(-x, kind="stable")] = np.arange(1, x.size + 1, dtype=np.float32)
+    return r
+
+def _fuse(ds: np.ndarray, bs: np.ndarray) -> np.ndarray:
+    if FUSION == "rrf":
+        # reciprocal-rank fusion: tidak peka skala skor dense vs BM25;
+        # kandidat tanpa term yang cocok (skor BM25 0) tidak mendapat suku BM25, bukan peringkat acak per id
+        sparse = np.where(bs > 0, 1.0 / (RRF_K + _ranks(bs)), 0.0)
+        return 1.0 / (RRF_K + _ranks(ds)) + sparse
+    return ALPHA * _minmax(ds) + (1.0 - ALPHA) * _minmax(bs)
+
+# -------- snapshot index (per versi; dibangun & ditukar oleh IndexManager) --------
+@dataclass
+class _Snapshot:
+    key: tuple                    # current_index_key() saat dibangun
+    corpus: List[str]
+    sources: List[str]
+    bm25: bm25.BM25Index
+    minilm: Optional[tuple]       # (M, index) MiniLM
+    bge: Optional[tuple]          # (M, index) BGE-M3, bila tersedia
+    bge_pending: bool = False     # BGE-M3 sedang backoff saat build: bangun ulang setelah modelnya termuat
+
+def _load_meta(key: tuple) -> List[Dict]:
+    meta_path = key[2]
+    if not os.path.exists(meta_path):
+        raise RuntimeError("meta.json tidak ditemukan. Jalankan `python scripts/ingest.py` dulu.")
+    return load_meta(meta_path)
 
 # -------- BM25 --------
-@lru_cache(maxsize=1)
-def _load_bm25():
-    corpus = _load_corpus()
-    toks = [c.lower().split() for c in corpus]
-    return BM25Okapi(toks), toks
+def _load_bm25(key: tuple, corpus: List[str]) -> bm25.BM25Index:
+    # versi dari ingest: pakai inverted index tersimpan; file lama (versi 0): bangun di memori
+    version = key[0]
+    return bm25.load_or_build(versioned_path(BM25_PATH, version) if version else None, corpus)
 
 # -------- Dense: prefer BGE-M3, fallback ke MiniLM index lama --------
-@lru_cache(maxsize=1)
-def _has_minilm_index() -> bool:
-    return os.path.exists(MINILM_INDEX_PATH)
-
-@lru_cache(maxsize=1)
-def _load_minilm_matrix():
-    if not _has_minilm_index():
-        return None
-    arr = np.load(MINILM_INDEX_PATH)
-    return arr["embeddings"]  # (N, D)
-
-# Try import FlagEmbedding lazily
-def _try_import_bge():
-    try:
-        from FlagEmbedding import BGEM3FlagModel  # type: ignore
-        return BGEM3FlagModel
-    except Exception as e:
-        log.warning("BGEM3 not available (%s). Will use fallback dense.", e)
-        return None
-
-@lru_cache(maxsize=1)
-def _load_bge_model():
-    BGEM3 = _try_import_bge()
-    if BGEM3 is None:
-        return None
-    try:
-        # CPU-ok; set devices=["cuda:0"] bila ada GPU
-        return BGEM3("BAAI/bge-m3", use_fp16=False, devices=["cpu"])
-    except Exception as e:
-        log.warning("Failed to init BGE-M3 model: %s", e)
-        return None
-
-@lru_cache(maxsize=1)
-def _load_or_build_bge_matrix():
-    model = _load_bge_model()
-    if model is None:
-        return None
-    if os.path.exists(BGE_CACHE):
-        arr = np.load(BGE_CACHE)
-        return arr["emb"]
-    # build sekali
-    corpus = _load_corpus()
-    enc = model.encode(
-        corpus, batch_size=24, max_length=8192,
-        use_fp16=False, return_dense=True
-    )
-    emb = np.asarray(enc["dense_vecs"], dtype=np.float32)
-    os.makedirs(STORAGE_DIR, exist_ok=True)
-    np.savez_compressed(BGE_CACHE, emb=emb)
-    return emb
-
-def _dense_scores(query: str) -> np.ndarray:
+def _load_minilm(key: tuple) -> Optional[tuple]:
+    M = load_index_matrix(key[1])  # (N, D), ternormalisasi, mmap
+    return None if M is None else (M, load_index(key[1], M))
+
+def _previous_bge(version: int):
+    # cache BGE dari versi sebelumnya yang masih ada, beserta meta-nya (untuk dipakai ulang per hash chunk)
+    pattern = re.compile(r"^index_bge_m3\.v(\d+)\.npy$")
+    versions = [int(m.group(1)) for m in map(pattern.match, os.listdir(STORAGE_DIR)) if m]
+    for v in sorted([x for x in versions if x < version], reverse=True) + [0]:
+        path, meta_path = versioned_path(BGE_CACHE, v), versioned_path(META_PATH, v)
+        if os.path.exists(path) and os.path.exists(meta_path):
+            return load_meta(meta_path), load_matrix(path)
+    return [], None
+
+def _load_or_build_bge_matrix(key: tuple, meta: List[Dict]) -> tuple:
+    version = key[0]
+    path = versioned_path(BGE_CACHE, version)
+    M = load_matrix(path)
+    if M is not None and M.shape[0] == len(meta):
+        return M, load_index(path, M)
+    # build sekali per versi; hanya chunk yang belum ada di cache sebelumnya yang di-encode
+    docs = ({"text": it["text"], "hash": it.get("hash") or chunk_hash(it["text"])} for it in meta)
+    prev_docs, prev_M = _previous_bge(version) if version else ([], None)
+    write_embeddings(path, docs, prev_docs, prev_M, embeddings.encode_bge_m3)
+    M = load_matrix(path)
+    return M, build_index(path, M)
+
+def _build_snapshot(key: tuple) -> _Snapshot:
+    meta = _load_meta(key)
+    corpus = [it["text"] for it in meta]
+    bge = None
+    model = embeddings.get_model(embeddings.BGE_M3)
+    if model is not None:
+        try:
+            bge = _load_or_build_bge_matrix(key, meta)
+        except Exception as e:
+            log.warning("BGE-M3 index build failed: %s", e)
+    pending = model is None and embeddings.retrying(embeddings.BGE_M3)
+    return _Snapshot(key, corpus, [it["source"] for it in meta], _load_bm25(key, corpus), _load_minilm(key), bge,
+                     pending)
+
+_index = index_manager.register("hybrid", _build_snapshot)
+
+def _snapshot() -> _Snapshot:
+    snap = _index.get()
+    if snap.bge_pending and embeddings.get_model(embeddings.BGE_M3) is not None:
+        # BGE-M3 baru termuat setelah backoff: bangun ulang snapshot di latar (sekali), MiniLM tetap melayani
+        snap.bge_pending = False
+        _index.reload(force=True)
+    return snap
+
+def _dense_query(query: str, snap: _Snapshot):
     """
-    Kembalikan skor dense untuk seluruh korpus:
+    Kembalikan (nama model, query_vec, matriks, index) untuk pencarian dense:
     1) Coba BGE-M3
-    2) Jika gagal/absen, pakai MiniLM index lama (index.npz) + SentenceTransformer untuk query
-    3) Jika keduanya tak ada, return zeros
+    2) Jika gagal/absen, pakai MiniLM index lama (index.npz) + encoder MiniLM dari registry
+    3) Jika keduanya tak ada, return None
     """
     # 1) BGE-M3
-    model = _load_bge_model()
-    if model is not None:
+    if snap.bge is not None:
         try:
-            q = model.encode([query], return_dense=True, use_fp16=False)["dense_vecs"][0]
-            q = np.asarray(q, dtype=np.float32)
-            M = _load_or_build_bge_matrix()
-            if M is not None:
-                return _cosine_sim(q, M)
+            name = embeddings.model_name(embeddings.BGE_M3)
+            q = cached_embedding(name, query, lambda text: embeddings.encode_bge_m3([text])[0])
+            M, index = snap.bge
+            return name, q, M, index
         except Exception as e:
             log.warning("BGE-M3 scoring failed: %s", e)
 
-    # 2) Fallback MiniLM
-    M2 = _load_minilm_matrix()
-    if M2 is not None:
-        # import di sini supaya ringan saat BGE jalan
-        from sentence_transformers import SentenceTransformer  # type: ignore
-        import os as _os
-        model_name = _os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
-        st = SentenceTransformer(model_name)
-        q2 = st.encode(query, normalize_embeddings=False)
-        q2 = np.asarray(q2, dtype=np.float32)
-        return _cosine_sim(q2, M2)
+    # 2) Fallback MiniLM (encoder dari registry, dimuat sekali per proses)
+    if snap.minilm is not None:
+        name = embeddings.model_name(embeddings.MINILM)
+        q2 = cached_embedding(name, query, lambda text: embeddings.encode_minilm([text])[0])
+        M2, index2 = snap.minilm
+        return name, q2, M2, index2
 
     # 3) No dense available
-    return np.zeros(len(_load_corpus()), dtype=np.float32)
+    return None
 
 # -------- Public API --------
+def query_vector(query: str):
+    """(nama model, embedding query) yang dipakai pencarian dense aktif; dari query_cache bila query baru dicari."""
+    dense = _dense_query(query, _snapshot())
+    return None if dense is None else dense[:2]
+
 def retrieve_hybrid(query: str, top_k: int | None = None) -> List[Dict]:
     k = top_k or TOP_K_DEFAULT
-    corpus = _load_corpus()
-    sources = _load_sources()
-
-    # dense & bm25
-    ds = _dense_scores(query)                             # shape (N,)
-    bm25, _ = _load_bm25()
-    bs = np.array(bm25.get_scores(query.lower().split()), dtype=np.float32)
-
-    # normalisasi + gabung
-    ds_n = _minmax(ds)
-    bs_n = _minmax(bs)
-    hybrid = ALPHA * ds_n + (1.0 - ALPHA) * bs_n
+    # snapshot aktif dari IndexManager; versi baru ditukar di latar tanpa restart
+    snap = _snapshot()
+    # versi index + sisi dense: hasil MiniLM tidak dipakai lagi setelah snapshot BGE-M3 aktif
+    version = (snap.key, snap.bge is not None)
+    return cached_hits("hybrid", version, query, k, lambda: _retrieve_hybrid(query, k, snap))
+
+def _retrieve_hybrid(query: str, k: int, snap: _Snapshot) -> List[Dict]:
+    corpus = snap.corpus
+    sources = snap.sources
+    m = max(HYBRID_CANDIDATES, k)
+
+    # kandidat: gabungan top-M BM25 dan top-M dense (dari index flat/ivf/hnsw)
+    b_ids, b_scores = snap.bm25.search(query)    # hanya dokumen yang memuat term query
+    cand = [b_ids[_top_k(b_scores, m)]]
+    dense = _dense_query(query, snap)
+    if dense is not None:
+        _, q, M, index = dense
+        ids, _ = index.search(q, m)
+        cand.append(ids)
+    cand = np.unique(np.concatenate(cand))    # terurut -> baris memmap dibaca berurutan
+
+    # skor exact, normalisasi dan fusi hanya atas kandidat
+    ds = cosine_scores(q, M[cand]) if dense is not None else np.zeros(cand.size, dtype=np.float32)
+    bs = _lookup(b_ids, b_scores, cand)
+    hybrid = _fuse(ds, bs)
 
-    idx = np.argsort(-hybrid)[:k]
     out = []
-    for i in idx:
+    for j in _top_k(hybrid, k):
+        i = int(cand[j])
         out.append({
-            "id": int(i),
-            "score_dense": float(ds[i]),
-            "score_bm25": float(bs[i]),
-            "score": float(hybrid[i]),
+            "id": i,
+            "score_dense": float(ds[j]),
+            "score_bm25": float(bs[j]),
+            "score": float(hybrid[j]),
             "text": corpus[i],
             "source": sources[i],
         })
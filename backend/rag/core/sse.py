@@ -0,0 +1,43 @@
+# backend/rag/core/sse.py
+# Util server-sent events format OpenAI (chat.completion.chunk) untuk respons streaming.
+import json, time, uuid
+from typing import AsyncIterator, Dict, Optional
+
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}   # matikan buffering proxy (nginx)
+SSE_DONE = "data: [DONE]\n\n"
+
+def sse_event(data: Dict) -> str:
+    return f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+def new_completion_id() -> str:
+    return f"chatcmpl-{uuid.uuid4().hex}"
+
+def completion_chunk(completion_id: str, model: str, content: Optional[str] = None,
+                     finish_reason: Optional[str] = None, **extra) -> Dict:
+    delta = {"content": content} if content is not None else {}
+    return {
+        "id": completion_id,
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+        **extra,
+    }
+
+def final_chunk(completion_id: str, model: str, **extra) -> Dict:
+    # event terakhir sebelum [DONE]: tanpa choices, membawa metadata tambahan (kai_sources, dst.)
+    return {"id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()),
+            "model": model, "choices": [], **extra}
+
+async def iter_sse_data(response) -> AsyncIterator[Dict]:
+    """Parse stream SSE upstream (httpx response) menjadi dict per event `data:`; berhenti di [DONE]."""
+    async for line in response.aiter_lines():
+        if not line.startswith("data:"):
+            continue   # komentar keep-alive (": OPENROUTER PROCESSING") / baris kosong
+        data = line[5:].strip()
+        if data == "[DONE]":
+            return
+        try:
+            yield json.loads(data)
+        except json.JSONDecodeError:
+            continue
@@ -1,4 +1,13 @@
-from typing import Iterable
+import os, re
+from typing import Iterable, Iterator, List, Tuple, Union
+from rag.core.tokens import count_tokens
+
+CHUNK_TOKENS = int(os.getenv("CHUNK_TOKENS", "300"))   # ukuran maksimum chunk markdown_chunk (token)
+
+_HEADING_RE = re.compile(r"^(#{1,6})\s+\S")
+_FENCE_RE = re.compile(r"^(```|~~~)")
+_TABLE_SEP_RE = re.compile(r"^\|?\s*:?-{3,}:?\s*(\|\s*:?-{3,}:?\s*)*\|?$")
+_SENTENCE_RE = re.compile(r"(?<=[.!?…;])\s+")
 
 def simple_chunk(text: str, chunk_size: int = 800, overlap: int = 100) -> Iterable[str]:
     # approx by characters (simple & robust)
@@ -13,3 +22,107 @@ def simple_chunk(text: str, chunk_size: int = 800, overlap: int = 100) -> Iterab
         if end == len(text):
             break
         start = max(0, end - overlap)
+
+# -------- markdown --------
+def _blocks(lines: Iterable[str]) -> Iterator[Tuple[str, str]]:
+    # ("heading" | "table" | "code" | "text", isi blok); dibaca baris per baris, tidak perlu seluruh file
+    buf: List[str] = []
+    kind, fence = None, None
+    for raw in lines:
+        line = raw.rstrip("\r\n")
+        stripped = line.strip()
+        if fence:
+            buf.append(line)
+            if stripped.startswith(fence):
+                yield "code", "\n".join(buf)
+                buf, kind, fence = [], None, None
+            continue
+        m = _FENCE_RE.match(stripped)
+        if m or _HEADING_RE.match(stripped) or not stripped:
+            if buf:
+                yield kind, "\n".join(buf)
+            buf, kind = [], None
+            if m:
+                buf, kind, fence = [line], "code", m.group(1)
+            elif stripped:
+                yield "heading", stripped
+            continue
+        this = "table" if stripped.startswith("|") else "text"
+        if this == "table":
+            # padding kolom & garis pemisah panjang hanya memboroskan token
+            line = re.sub(r"-{3,}", "---", re.sub(r" {2,}", " ", stripped))
+        if buf and kind != this:
+            yield kind, "\n".join(buf)
+            buf = []
+        kind = this
+        buf.append(line)
+    if buf:
+        yield kind, "\n".join(buf)
+
+def _pack(units: List[str], budget: int, sep: str, prefix: str = "") -> Iterator[str]:
+    # gabungkan unit berurutan sampai budget (jumlah token per unit, tanpa menghitung ulang gabungannya);
+    # unit yang sendirian sudah terlalu besar dipecah per kata
+    base, sep_tokens = count_tokens(prefix), count_tokens(sep)
+    cur: List[str] = []
+    used = base
+    for unit in units:
+        size = count_tokens(unit)
+        if used + size + (sep_tokens if cur else 0) <= budget:
+            used += size + (sep_tokens if cur else 0)
+            cur.append(unit)
+            continue
+        if cur:
+            yield prefix + sep.join(cur)
+            cur, used = [], base
+        if base + size <= budget:
+            cur, used = [unit], base + size
+        else:
+            words = unit.split(" ")
+            yield from _pack(words, budget, " ", prefix) if len(words) > 1 else [prefix + unit]
+    if cur:
+        yield prefix + sep.join(cur)
+
+def _split_block(kind: str, block: str, budget: int) -> Iterator[str]:
+    if count_tokens(block) <= budget:
+        yield block
+    elif kind == "table":
+        # header tabel diulang di tiap potongan supaya kolomnya tetap terbaca
+        rows = block.split("\n")
+        head = rows[:2] if len(rows) > 2 and _TABLE_SEP_RE.match(rows[1]) else []
+        yield from _pack(rows[len(head):], budget, "\n", "\n".join(head) + "\n" if head else "")
+    elif kind == "code":
+        yield from _pack(block.split("\n"), budget, "\n")
+    else:
+        yield from _pack(_SENTENCE_RE.split(block), budget, " ")
+
+def markdown_chunk(text: Union[str, Iterable[str]], max_tokens: int = CHUNK_TOKENS) -> Iterator[str]:
+    """Chunk mengikuti struktur Markdown: potong di heading, lalu di batas paragraf/tabel/kalimat.
+    Tiap chunk diawali jalur heading-nya; tabel yang dipecah membawa header kolomnya. Tanpa overlap."""
+    lines = text.splitlines() if isinstance(text, str) else text
+    path: List[Tuple[int, str]] = []
+    body: List[str] = []
+    used = 0
+
+    def emit() -> Iterator[str]:
+        header = "\n".join(h for _, h in path)
+        yield (header + "\n\n" if header else "") + "\n\n".join(body)
+
+    for kind, block in _blocks(lines):
+        if kind == "heading":
+            if body:
+                yield from emit()
+                body, used = [], 0
+            level = len(block) - len(block.lstrip("#"))
+            path = [h for h in path if h[0] < level] + [(level, block)]
+            continue
+        header_tokens = count_tokens("\n".join(h for _, h in path) + "\n\n") if path else 0
+        budget = max(max_tokens - header_tokens, max_tokens // 2)
+        for piece in _split_block(kind, block, budget):
+            size = count_tokens(piece)
+            if body and used + size > budget:
+                yield from emit()
+                body, used = [], 0
+            body.append(piece)
+            used += size + 1   # +1: pemisah paragraf
+    if body:
+        yield from emit()
@@ -0,0 +1,30 @@
+# backend/rag/core/tokens.py
+# Penghitung token lokal untuk budget prompt/memori. Pakai tiktoken bila terpasang
+# (encoding dari TOKENIZER_ENCODING), selain itu estimasi dari jumlah kata & tanda baca.
+import os, re, logging
+from functools import lru_cache
+
+TOKENIZER_ENCODING = os.getenv("TOKENIZER_ENCODING", "cl100k_base")
+TOKENS_PER_WORD = float(os.getenv("TOKENS_PER_WORD", "1.4"))   # rata-rata BPE untuk teks bahasa Indonesia
+
+_WORD_RE = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+
+log = logging.getLogger("tokens")
+
+@lru_cache(maxsize=1)
+def _encoding():
+    try:
+        import tiktoken  # type: ignore
+        return tiktoken.get_encoding(TOKENIZER_ENCODING)
+    except Exception as e:
+        log.info("tiktoken not available (%s). Using word-based token estimate.", e)
+        return None
+
+@lru_cache(maxsize=8192)
+def count_tokens(text: str) -> int:
+    if not text:
+        return 0
+    enc = _encoding()
+    if enc is not None:
+        return len(enc.encode(text, disallowed_special=()))
+    return max(1, int(round(len(_WORD_RE.findall(text)) * TOKENS_PER_WORD)))
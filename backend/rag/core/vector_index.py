@@ -0,0 +1,190 @@
+# backend/rag/core/vector_index.py
+# Index vektor pluggable di atas matriks ternormalisasi dari index_store:
+#   flat  -> exact (M @ q)
+#   ivf   -> inverted file (k-means numpy, murni offline)
+#   hnsw  -> hnswlib (opsional, pip install hnswlib)
+# Index dibangun saat ingest dan disimpan di samping matriks .npy.
+import os, json, logging, numpy as np
+from typing import Tuple, Optional
+from rag.core.index_store import normalize_vector, cosine_scores, file_stamp
+
+VECTOR_INDEX = os.getenv("VECTOR_INDEX", "flat")          # flat | ivf | hnsw
+IVF_NLIST = int(os.getenv("IVF_NLIST", "0"))               # 0 = sqrt(N)
+IVF_NPROBE = int(os.getenv("IVF_NPROBE", "8"))
+HNSW_M = int(os.getenv("HNSW_M", "16"))
+HNSW_EF_CONSTRUCTION = int(os.getenv("HNSW_EF_CONSTRUCTION", "200"))
+HNSW_EF = int(os.getenv("HNSW_EF", "64"))
+
+log = logging.getLogger("vector_index")
+log.setLevel(logging.INFO)
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indeks k skor tertinggi (urut menurun) tanpa mengurutkan seluruh array."""
+    n = scores.shape[0]
+    if n == 0 or k <= 0:
+        return np.empty(0, dtype=np.int64)
+    if k < n:
+        idx = np.argpartition(-scores, k - 1)[:k]
+    else:
+        idx = np.arange(n)
+    return idx[np.argsort(-scores[idx], kind="stable")]
+
+# -------- flat --------
+class FlatIndex:
+    kind = "flat"
+
+    def __init__(self, M: np.ndarray):
+        self.M = M
+
+    def search(self, q: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        scores = cosine_scores(q, self.M)
+        idx = top_k(scores, k)
+        return idx, scores[idx]
+
+# -------- IVF --------
+class IVFIndex:
+    kind = "ivf"
+
+    def __init__(self, M: np.ndarray, centroids: np.ndarray, order: np.ndarray, offsets: np.ndarray, nprobe: int = IVF_NPROBE):
+        self.M = M
+        self.centroids = centroids
+        self.order = order          # id dokumen diurutkan per cluster
+        self.offsets = offsets      # batas tiap cluster di `order`
+        self.nprobe = nprobe
+
+    @classmethod
+    def build(cls, M: np.ndarray, nlist: int = IVF_NLIST, iters: int = 10, seed: int = 0) -> "IVFIndex":
+        X = np.asarray(M, dtype=np.float32)
+        n = X.shape[0]
+        nlist = min(nlist or max(1, int(np.sqrt(n))), max(n, 1))
+        rng = np.random.default_rng(seed)
+
+        # spherical k-means pada sampel (vektor sudah ternormalisasi)
+        sample = X[rng.choice(n, size=min(n, 256 * nlist), replace=False)] if n else X
+        centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+        for _ in range(iters):
+            assign = np.argmax(sample @ centroids.T, axis=1)
+            for c in range(nlist):
+                members = sample[assign == c]
+                if len(members):
+                    centroids[c] = members.mean(axis=0)
+                else:
+                    centroids[c] = sample[rng.integers(len(sample))]
+            centroids /= (np.linalg.norm(centroids, axis=1, keepdims=True) + 1e-8)
+
+        assign = _assign(X, centroids)
+        order = np.argsort(assign, kind="stable").astype(np.int64)
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(assign, minlength=nlist))]).astype(np.int64)
+        return cls(M, centroids, order, offsets)
+
+    def search(self, q: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        q = normalize_vector(q)
+        probe = top_k(self.centroids @ q, min(self.nprobe, len(self.centroids)))
+        # urutkan id agar baris memmap dibaca berurutan
+        ids = np.sort(np.concatenate([self.order[self.offsets[c]:self.offsets[c + 1]] for c in probe]))
+        if ids.size == 0:
+            return ids, np.empty(0, dtype=np.float32)
+        scores = np.asarray(self.M[ids] @ q.astype(self.M.dtype, copy=False), dtype=np.float32)
+        idx = top_k(scores, k)
+        return ids[idx], scores[idx]
+
+    def save(self, path: str) -> None:
+        tmp = path + ".tmp.npz"
+        np.savez(tmp, centroids=self.centroids, order=self.order, offsets=self.offsets)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str, M: np.ndarray) -> "IVFIndex":
+        arr = np.load(path)
+        return cls(M, arr["centroids"], arr["order"], arr["offsets"])
+
+def _assign(X: np.ndarray, centroids: np.ndarray, batch: int = 65536) -> np.ndarray:
+    # assignment per batch agar memori tetap terbatas pada korpus besar
+    out = np.empty(X.shape[0], dtype=np.int64)
+    for start in range(0, X.shape[0], batch):
+        out[start:start + batch] = np.argmax(X[start:start + batch] @ centroids.T, axis=1)
+    return out
+
+# -------- HNSW (hnswlib, opsional) --------
+def _try_import_hnswlib():
+    try:
+        import hnswlib  # type: ignore
+        return hnswlib
+    except Exception as e:
+        log.warning("hnswlib not available (%s). Will use flat index.", e)
+        return None
+
+class HNSWIndex:
+    kind = "hnsw"
+
+    def __init__(self, M: np.ndarray, index):
+        self.M = M
+        self.index = index
+        self.index.set_ef(HNSW_EF)
+
+    @classmethod
+    def build(cls, M: np.ndarray) -> Optional["HNSWIndex"]:
+        hnswlib = _try_import_hnswlib()
+        if hnswlib is None:
+            return None
+        index = hnswlib.Index(space="ip", dim=M.shape[1])
+        index.init_index(max_elements=max(M.shape[0], 1), ef_construction=HNSW_EF_CONSTRUCTION, M=HNSW_M)
+        index.add_items(np.asarray(M, dtype=np.float32), np.arange(M.shape[0]))
+        return cls(M, index)
+
+    def search(self, q: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        k = min(k, self.M.shape[0])
+        if k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        labels, distances = self.index.knn_query(normalize_vector(q), k=k)
+        # jarak "ip" di hnswlib = 1 - dot
+        return labels[0].astype(np.int64), (1.0 - distances[0]).astype(np.float32)
+
+    def save(self, path: str) -> None:
+        self.index.save_index(path)
+
+    @classmethod
+    def load(cls, path: str, M: np.ndarray) -> Optional["HNSWIndex"]:
+        hnswlib = _try_import_hnswlib()
+        if hnswlib is None:
+            return None
+        index = hnswlib.Index(space="ip", dim=M.shape[1])
+        index.load_index(path, max_elements=max(M.shape[0], 1))
+        return cls(M, index)
+
+# -------- build / load --------
+_KINDS = {"ivf": (IVFIndex, ".ivf.npz"), "hnsw": (HNSWIndex, ".hnsw")}
+
+def index_path(matrix_path: str, kind: str) -> str:
+    return os.path.splitext(matrix_path)[0] + _KINDS[kind][1]
+
+def build_index(matrix_path: str, M: np.ndarray, kind: str = VECTOR_INDEX):
+    """Bangun index untuk matriks di `matrix_path` dan simpan (dipanggil saat ingest)."""
+    if kind not in _KINDS or M.shape[0] == 0:
+        return FlatIndex(M)
+    cls, _ = _KINDS[kind]
+    index = cls.build(M)
+    if index is None:
+        return FlatIndex(M)
+    path = index_path(matrix_path, kind)
+    index.save(path)
+    with open(path + ".json", "w", encoding="utf-8") as f:
+        json.dump({"kind": kind, "matrix_stamp": file_stamp(matrix_path)}, f)
+    return index
+
+def load_index(matrix_path: str, M: np.ndarray, kind: str = VECTOR_INDEX):
+    """Muat index tersimpan bila masih cocok dengan matriksnya; bila tidak, bangun ulang."""
+    if kind not in _KINDS:
+        return FlatIndex(M)
+    path = index_path(matrix_path, kind)
+    try:
+        with open(path + ".json", "r", encoding="utf-8") as f:
+            info = json.load(f)
+        if info.get("matrix_stamp") == json.loads(json.dumps(file_stamp(matrix_path))):
+            cls, _ = _KINDS[kind]
+            index = cls.load(path, M)
+            if index is not None:
+                return index
+    except (OSError, ValueError, KeyError) as e:
+        log.info("Vector index %s not reusable (%s), rebuilding.", path, e)
+    return build_index(matrix_path, M, kind)
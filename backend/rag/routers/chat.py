@@ -1,9 +1,16 @@
 from fastapi import APIRouter
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import Optional
-from app.core.llm import openrouter_chat
-from app.core.memory import memory                # ⬅️ NEW
-from app.core.retrieval import retrieve_hybrid as retrieve  # atau retrieval biasa
+from rag.core.llm import openrouter_chat, openrouter_chat_stream
+from rag.core.settings import settings
+from rag.core.executor import run_retrieval
+from rag.core.context import pack_context
+from rag.core.response_cache import response_cache, make_key
+from rag.core.sse import SSE_HEADERS, SSE_DONE, sse_event, new_completion_id, completion_chunk, final_chunk
+from rag.core.memory import memory                # ⬅️ NEW
+from rag.core.retrieval import retrieve_hybrid as retrieve, query_vector  # atau retrieval biasa
 import os
 
 router = APIRouter()
@@ -16,6 +23,7 @@ class ChatRequest(BaseModel):
     message: str
     user_id: Optional[str] = None      # bisa pakai ini sebagai session_id
     tone: Optional[str] = "conversational-pro"
+    stream: Optional[bool] = False     # true -> SSE chunk format OpenAI
 
 TONE_HINTS = {
     "conversational-pro": "Tulis seperti CS profesional: hangat, langsung, mudah dipahami. Rujuk singkat ke penjelasan sebelumnya bila relevan.",
@@ -23,15 +31,26 @@ TONE_HINTS = {
     "formal": "Gaya formal dan lugas.",
 }
 
+def _remember(session_id: str, message: str, answer: str):
+    memory.append(session_id, "user", message)
+    memory.append(session_id, "assistant", answer)
+
+def _retrieve(message: str, scope: Optional[tuple]):
+    hits = retrieve(message)
+    return hits, (make_key(message, hits, scope, query_vector) if scope else None)
+
 @router.post("/chat")
 async def chat(req: ChatRequest):
     session_id = req.user_id or "default"   # ⬅️ ambil session id dari user_id; UI akan mengirimkannya
     # 1) Ambil memori percakapan pendek
-    history = memory.get(session_id)
+    # backend sqlite/redis = I/O blocking, jalankan di threadpool agar event loop tetap bebas
+    history = await run_in_threadpool(memory.get, session_id)
 
-    # 2) Retrieval untuk pertanyaan TERKINI
-    hits = retrieve(req.message)
-    context = "\n\n---\n".join([f"[{h['source']}]\n{h['text']}" for h in hits])
+    # 2) Retrieval untuk pertanyaan TERKINI (di thread pool, event loop tetap bebas).
+    #    Cache jawaban hanya untuk pertanyaan pembuka: dengan riwayat, jawaban ikut bergantung pada percakapan.
+    scope = None if history else ("rag-chat", settings.OPENROUTER_MODEL, req.tone or "conversational-pro")
+    hits, cache_key = await run_retrieval(_retrieve, req.message, scope)
+    context, _ = pack_context(hits)   # dedupe + gabung chunk bertetangga, dibatasi CONTEXT_TOKEN_BUDGET
 
     tone_hint = TONE_HINTS.get(req.tone or "conversational-pro", TONE_HINTS["conversational-pro"])
 
@@ -41,17 +60,63 @@ async def chat(req: ChatRequest):
     messages.extend(history)
     messages.append({"role": "user", "content": req.message})
 
-    answer = await openrouter_chat(messages, temperature=0.5)
+    sources = [{"source": h["source"], "snippet": h["text"][:240] + ("..." if len(h["text"])>240 else "")} for h in hits]
+    meta = {"top_k": len(hits), "session_id": session_id}
+    cached = response_cache.get(cache_key)
+    if cached is not None:
+        answer, similarity = cached
+        meta["cache"] = {"hit": True, "similarity": round(similarity, 4)}
+    if req.stream:
+        stream = (_replay_answer(session_id, req.message, answer, sources, meta) if cached is not None
+                  else _stream_answer(session_id, req.message, messages, sources, meta, cache_key))
+        return StreamingResponse(stream, media_type="text/event-stream", headers=SSE_HEADERS)
+
+    if cached is None:
+        answer = await openrouter_chat(messages, temperature=0.5)
+        if answer.strip():
+            response_cache.put(cache_key, answer)
 
     # 4) Simpan ke memori (user→assistant)
-    memory.append(session_id, "user", req.message)
-    memory.append(session_id, "assistant", answer)
+    await run_in_threadpool(_remember, session_id, req.message, answer)
 
-    sources = [{"source": h["source"], "snippet": h["text"][:240] + ("..." if len(h["text"])>240 else "")} for h in hits]
-    return {"answer": answer.strip(), "sources": sources, "meta": {"top_k": len(hits), "session_id": session_id}}
+    return {"answer": answer.strip(), "sources": sources, "meta": meta}
+
+async def _stream_answer(session_id: str, message: str, messages: list, sources: list, meta: dict, cache_key=None):
+    cid, model = new_completion_id(), settings.OPENROUTER_MODEL
+    parts, failed = [], False
+    try:
+        async for delta in openrouter_chat_stream(messages, temperature=0.5):
+            parts.append(delta)
+            yield sse_event(completion_chunk(cid, model, delta))
+    except Exception as e:
+        # header 200 sudah terkirim; kabarkan error sebagai event
+        failed = True
+        yield sse_event({"error": {"message": str(e) or type(e).__name__}})
+    yield sse_event(completion_chunk(cid, model, finish_reason="stop"))
+
+    # 4) Simpan ke memori (user→assistant) setelah jawaban lengkap
+    answer = "".join(parts).strip()
+    if answer:
+        await run_in_threadpool(_remember, session_id, message, answer)
+        if not failed:
+            response_cache.put(cache_key, answer)
+
+    resolution = {"requested": None, "resolved": model, "fallback": False}
+    yield sse_event(final_chunk(cid, model, kai_sources=sources, model_resolution=resolution, meta=meta))
+    yield SSE_DONE
+
+async def _replay_answer(session_id: str, message: str, answer: str, sources: list, meta: dict):
+    # jawaban dari cache dikirim sebagai satu chunk, format event sama dengan stream upstream
+    cid, model = new_completion_id(), settings.OPENROUTER_MODEL
+    yield sse_event(completion_chunk(cid, model, answer))
+    yield sse_event(completion_chunk(cid, model, finish_reason="stop"))
+    await run_in_threadpool(_remember, session_id, message, answer)
+    resolution = {"requested": None, "resolved": model, "fallback": False}
+    yield sse_event(final_chunk(cid, model, kai_sources=sources, model_resolution=resolution, meta=meta))
+    yield SSE_DONE
 
 @router.post("/chat/reset")
 async def reset_chat(user_id: Optional[str] = None):
     sid = user_id or "default"
-    memory.clear(sid)
+    await run_in_threadpool(memory.clear, sid)
     return {"ok": True, "session_id": sid}
\ No newline at end of file
@@ -0,0 +1,25 @@
+from fastapi import APIRouter, Body
+from fastapi.concurrency import run_in_threadpool
+from pydantic import BaseModel
+from typing import Optional
+from rag.core import index_manager
+from rag.core.index_store import current_index
+
+router = APIRouter()
+
+class ReloadRequest(BaseModel):
+    force: bool = False    # bangun ulang walau versi manifest tidak berubah
+    wait: bool = False     # tunggu sampai snapshot baru aktif
+
+@router.get("/index/status")
+async def index_status():
+    version, _, _ = current_index()
+    return {"manifest_version": version, "indexes": index_manager.get_status()}
+
+@router.post("/index/reload")
+async def index_reload(req: Optional[ReloadRequest] = Body(default=None)):
+    req = req or ReloadRequest()
+    # wait=True membangun snapshot (meta, BM25, encode BGE-M3) di thread ini; jangan di event loop
+    scheduled = await run_in_threadpool(index_manager.reload_all, wait=req.wait, force=req.force)
+    version, _, _ = current_index()
+    return {"ok": True, "scheduled": scheduled, "manifest_version": version, "indexes": index_manager.get_status()}
@@ -1,11 +1,20 @@
 from fastapi import APIRouter, Response, status
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import List, Literal, Optional
 import httpx, os, json
 
 # ✅ gunakan path modul yang benar (rag.core.*)
 from rag.core.settings import settings
-from rag.core.retrieval_basic import retrieve
+from rag.core.retrieval_basic import retrieve, query_vector
+from rag.core.http_client import get_client
+from rag.core.executor import run_retrieval
+from rag.core.context import pack_context, trim_messages
+from rag.core.memory import MEMORY_TOKEN_BUDGET
+from rag.core.response_cache import response_cache, make_key
+from rag.core.sse import (
+    SSE_HEADERS, SSE_DONE, sse_event, new_completion_id, completion_chunk, final_chunk, iter_sse_data,
+)
 
 
 # --- tambahkan di atas (setelah import) ---
@@ -31,63 +40,83 @@ class ORRequest(BaseModel):
     stream: Optional[bool] = False
 
 router = APIRouter()
-OPENROUTER_URL = "https://openrouter.ai/api/v1/chat/completions"
+OPENROUTER_URL = os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1") + "/chat/completions"
 PROMPT_PATH = os.path.join(os.path.dirname(__file__), "..", "prompts", "system_kai.md")
 SYSTEM = open(PROMPT_PATH, "r", encoding="utf-8").read().strip() if os.path.exists(PROMPT_PATH) else "Anda adalah Asisten KAI..."
 
 
-def _inject_rag(req: ORRequest):
+def _inject_rag(req: ORRequest, cache_scope: Optional[tuple] = None):
     last_user = next((m.content for m in reversed(req.messages) if m.role=="user"), "")
     hits = retrieve(last_user)
-    context = "\n\n---\n".join([f"[{h['source']}]\n{h['text']}" for h in hits])
+    context, _ = pack_context(hits)   # dibatasi CONTEXT_TOKEN_BUDGET
     system = SYSTEM + "\n\nKONTEN:\n" + context
-    tail = [m.model_dump() for m in req.messages if m.role != "system"]
-    return [{"role":"system","content": system}, *tail], hits
+    # riwayat dari klien dipangkas ke budget token; pertanyaan terakhir selalu ikut
+    tail = trim_messages([m.model_dump() for m in req.messages if m.role != "system"], MEMORY_TOKEN_BUDGET, keep_last=True)
+    # cache jawaban hanya untuk pertanyaan tunggal; dengan riwayat, jawaban bergantung pada percakapan
+    single = [m.role for m in req.messages if m.role != "system"] == ["user"]
+    cache_key = make_key(last_user, hits, cache_scope, query_vector) if cache_scope and single else None
+    return [{"role":"system","content": system}, *tail], hits, cache_key
 
 
 def _truncate(text: str, limit: int = 240) -> str:
     return text[:limit] + ("..." if len(text) > limit else "")
 
 
-def _rag_only_response(requested_model: Optional[str], hits, reason: str):
-    note = {
+def _sources(hits):
+    return [{"source": h["source"], "snippet": _truncate(h["text"], 240)} for h in hits]
+
+
+def _rag_only_note(requested_model: Optional[str], reason: str):
+    return {
         "requested": requested_model,
         "resolved": "rag-only",
         "fallback": True,
         "reason": reason,
     }
 
+
+def _rag_only_content(hits) -> str:
     if hits:
         bullet_points = "\n".join(
             [f"• [{h['source']}] {_truncate(h['text'], 200)}" for h in hits[:5]]
         )
-        content = (
+        return (
             "Saya belum dapat menghubungi model AI saat ini. Berikut informasi yang berhasil saya temukan:"
             f"\n\n{bullet_points}\n\nCoba lagi nanti atau hubungi tim untuk mengaktifkan model AI."
         )
+    return (
+        "Saya belum dapat menghubungi model AI saat ini dan tidak menemukan informasi relevan di basis data. "
+        "Silakan coba pertanyaan lain atau hubungi tim untuk mengaktifkan model AI."
+    )
+
+
+def _error_detail(data, status_code: int) -> str:
+    reason = data.get("error", data) if isinstance(data, dict) else data
+    if isinstance(reason, dict):
+        detail = reason.get("message") or reason.get("error") or json.dumps(reason, ensure_ascii=False)
     else:
-        content = (
-            "Saya belum dapat menghubungi model AI saat ini dan tidak menemukan informasi relevan di basis data. "
-            "Silakan coba pertanyaan lain atau hubungi tim untuk mengaktifkan model AI."
-        )
+        detail = str(reason)
+    return detail or f"HTTP {status_code}"
+
+
+def _raw_detail(text: str) -> str:
+    raw = text.strip()
+    return (raw[:400] + ("..." if len(raw) > 400 else "")) if raw else "OpenRouter mengembalikan response tidak valid"
+
 
+def _rag_only_response(requested_model: Optional[str], hits, reason: str):
+    note = _rag_only_note(requested_model, reason)
     data = {
         "model": note["resolved"],
         "choices": [
             {
                 "index": 0,
-                "message": {"role": "assistant", "content": content},
+                "message": {"role": "assistant", "content": _rag_only_content(hits)},
                 "finish_reason": "stop",
             }
         ],
         "model_resolution": note,
-        "kai_sources": [
-            {
-                "source": h["source"],
-                "snippet": _truncate(h["text"], 240),
-            }
-            for h in hits
-        ],
+        "kai_sources": _sources(hits),
     }
 
     return Response(
@@ -96,13 +125,107 @@ def _rag_only_response(requested_model: Optional[str], hits, reason: str):
         status_code=status.HTTP_200_OK,
     )
 
+
+async def _rag_only_stream(requested_model: Optional[str], hits, reason: str):
+    note = _rag_only_note(requested_model, reason)
+    cid = new_completion_id()
+    yield sse_event(completion_chunk(cid, note["resolved"], _rag_only_content(hits)))
+    yield sse_event(completion_chunk(cid, note["resolved"], finish_reason="stop"))
+    yield sse_event(final_chunk(cid, note["resolved"], model_resolution=note, kai_sources=_sources(hits)))
+    yield SSE_DONE
+
+
+def _cache_hit_note(note, similarity: float):
+    return {**note, "cache": {"hit": True, "similarity": round(similarity, 4)}}
+
+
+def _cached_response(cached, hits, note, similarity: float):
+    data = {
+        "id": new_completion_id(),
+        "object": "chat.completion",
+        "model": cached["model"],
+        "choices": [
+            {
+                "index": 0,
+                "message": {"role": "assistant", "content": cached["content"]},
+                "finish_reason": "stop",
+            }
+        ],
+        "model_resolution": _cache_hit_note(note, similarity),
+        "kai_sources": _sources(hits),
+    }
+    return Response(content=json.dumps(data, ensure_ascii=False), media_type="application/json")
+
+
+async def _cached_stream(cached, hits, note, similarity: float):
+    cid = new_completion_id()
+    yield sse_event(completion_chunk(cid, cached["model"], cached["content"]))
+    yield sse_event(completion_chunk(cid, cached["model"], finish_reason="stop"))
+    yield sse_event(final_chunk(cid, cached["model"], model_resolution=_cache_hit_note(note, similarity),
+                                kai_sources=_sources(hits)))
+    yield SSE_DONE
+
+
+def _delta_content(chunk) -> str:
+    choices = chunk.get("choices") or [{}]
+    return (choices[0].get("delta") or {}).get("content") or ""
+
+
+async def _stream_completion(req: ORRequest, payload, headers, hits, note, cache_key=None):
+    # chunk upstream diteruskan apa adanya; kai_sources & model_resolution dikirim di event terakhir
+    cid, model, started = new_completion_id(), payload["model"], False
+    cache_model = payload["model"]   # model di kunci cache; jawaban hard fallback tidak disimpan di bawahnya
+    parts = []
+    try:
+        client = get_client()
+        for attempt in range(2):
+            async with client.stream("POST", OPENROUTER_URL, headers=headers, json=payload) as response:
+                fb = settings.OPENROUTER_MODEL or "meta-llama/llama-3.1-8b-instruct"
+                if response.status_code in (400, 404) and attempt == 0 and payload["model"] != fb:
+                    # hard fallback, sama seperti mode non-stream
+                    payload["model"] = fb
+                    note["resolved"] = fb
+                    note["fallback"] = True
+                    continue
+                if response.status_code >= 400:
+                    text = (await response.aread()).decode("utf-8", errors="replace")
+                    try:
+                        detail = _error_detail(json.loads(text), response.status_code)
+                    except json.JSONDecodeError:
+                        detail = _raw_detail(text)
+                    async for event in _rag_only_stream(req.model, hits, detail):
+                        yield event
+                    return
+
+                async for chunk in iter_sse_data(response):
+                    cid = chunk.get("id") or cid
+                    model = chunk.get("model") or model
+                    started = True
+                    parts.append(_delta_content(chunk))
+                    yield sse_event(chunk)
+                content = "".join(parts)
+                if content.strip() and payload["model"] == cache_model:
+                    response_cache.put(cache_key, {"content": content, "model": model})
+                break
+    except httpx.HTTPError as e:
+        if not started:
+            async for event in _rag_only_stream(req.model, hits, str(e) or type(e).__name__):
+                yield event
+            return
+        note["error"] = str(e) or type(e).__name__
+
+    yield sse_event(final_chunk(cid, model, model_resolution=note, kai_sources=_sources(hits)))
+    yield SSE_DONE
+
+
 @router.post("/v1/chat/completions")
 async def openrouter_compatible(req: ORRequest):
-    messages, hits = _inject_rag(req)
     model, note = resolve_model(req.model)
+    scope = ("proxy", model, req.max_tokens, req.temperature)
+    messages, hits, cache_key = await run_retrieval(_inject_rag, req, scope)   # retrieval di thread pool terbatas
 
     payload = {"model": model, "messages": messages,
-               "max_tokens": req.max_tokens, "temperature": req.temperature, "stream": False}
+               "max_tokens": req.max_tokens, "temperature": req.temperature, "stream": bool(req.stream)}
 
     headers = {
         "Authorization": f"Bearer {settings.OPENROUTER_API_KEY}",
@@ -112,46 +235,52 @@ async def openrouter_compatible(req: ORRequest):
         "X-Title": "KAI Helper (RAG proxy)",
     }
 
+    cached = response_cache.get(cache_key)   # jawaban untuk pertanyaan serupa, tanpa memanggil LLM
+    if req.stream:
+        if cached is not None:
+            stream = _cached_stream(cached[0], hits, note, cached[1])
+        elif not settings.OPENROUTER_API_KEY:
+            stream = _rag_only_stream(req.model, hits, "OPENROUTER_API_KEY belum diset")
+        else:
+            stream = _stream_completion(req, payload, headers, hits, note, cache_key)
+        return StreamingResponse(stream, media_type="text/event-stream", headers=SSE_HEADERS)
+
+    if cached is not None:
+        return _cached_response(cached[0], hits, note, cached[1])
+
     if not settings.OPENROUTER_API_KEY:
         return _rag_only_response(req.model, hits, "OPENROUTER_API_KEY belum diset")
 
-    async with httpx.AsyncClient(timeout=60) as client:
-        response = await client.post(OPENROUTER_URL, headers=headers, json=payload)
-        if response.status_code in (400, 404):  # hard fallback jika tetap error
-            fb = settings.OPENROUTER_MODEL or "meta-llama/llama-3.1-8b-instruct"
-            if model != fb:
-                payload["model"] = fb
-                note["resolved"] = fb
-                note["fallback"] = True
-                response = await client.post(OPENROUTER_URL, headers=headers, json=payload)
+    client = get_client()   # pool koneksi bersama (lifespan server)
+    response = await client.post(OPENROUTER_URL, headers=headers, json=payload)
+    if response.status_code in (400, 404):  # hard fallback jika tetap error
+        fb = settings.OPENROUTER_MODEL or "meta-llama/llama-3.1-8b-instruct"
+        if model != fb:
+            payload["model"] = fb
+            note["resolved"] = fb
+            note["fallback"] = True
+            response = await client.post(OPENROUTER_URL, headers=headers, json=payload)
 
-        status_code = response.status_code
-        text = response.text
+    status_code = response.status_code
+    text = response.text
 
     try:
         data = json.loads(text)
     except json.JSONDecodeError:
-        raw = text.strip()
-        message = (raw[:400] + ("..." if len(raw) > 400 else "")) if raw else "OpenRouter mengembalikan response tidak valid"
-        return _rag_only_response(req.model, hits, message)
+        return _rag_only_response(req.model, hits, _raw_detail(text))
 
     data["model_resolution"] = note
 
     if status_code >= 400:
-        reason = data.get("error", data)
-        if isinstance(reason, dict):
-            detail = reason.get("message") or reason.get("error") or json.dumps(reason, ensure_ascii=False)
-        else:
-            detail = str(reason)
-        return _rag_only_response(req.model, hits, detail or f"HTTP {status_code}")
-
-    data["kai_sources"] = [
-        {
-            "source": h["source"],
-            "snippet": h["text"][:240] + ("..." if len(h["text"]) > 240 else ""),
-        }
-        for h in hits
-    ]
+        return _rag_only_response(req.model, hits, _error_detail(data, status_code))
+
+    data["kai_sources"] = _sources(hits)
+    try:
+        content = data["choices"][0]["message"]["content"]
+    except (KeyError, IndexError, TypeError):
+        content = None
+    if content and content.strip() and payload["model"] == model:   # bukan jawaban hard fallback
+        response_cache.put(cache_key, {"content": content, "model": data.get("model", payload["model"])})
 
     return Response(
         content=json.dumps(data, ensure_ascii=False),
@@ -0,0 +1,58 @@
+# Ekspor model YOLO KTP/KK ke ONNX (opsional INT8) atau OpenVINO.
+# Jalankan dari folder backend:
+#   python -m scripts.export_detection_model --format onnx
+#   python -m scripts.export_detection_model --format onnx-int8
+#   python -m scripts.export_detection_model --format openvino
+# lalu set DETECTION_BACKEND ke format yang sama.
+import argparse
+import os
+
+from model.detection_model import BACKEND_SUFFIXES
+
+def export(option, fmt, model_dir, imgsz):
+    from ultralytics import YOLO
+
+    source = os.path.join(model_dir, f"model_{option}.pt")
+    target = os.path.join(model_dir, f"model_{option}{BACKEND_SUFFIXES[fmt]}")
+    model = YOLO(source)
+
+    if fmt == 'openvino':
+        # ultralytics menulis ke folder <nama>_openvino_model di samping .pt
+        return model.export(format='openvino', imgsz=imgsz)
+
+    # batch dinamis agar InferenceController bisa mengirim micro-batch sekaligus
+    exported = model.export(format='onnx', imgsz=imgsz, dynamic=True, simplify=True)
+    if fmt == 'onnx':
+        return exported
+
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    quantize_dynamic(exported, target, weight_type=QuantType.QUInt8)
+
+    # quantize_dynamic tidak menyalin metadata (names, imgsz) yang dibaca OnnxYoloModel
+    import onnx
+    source_model = onnx.load(exported)
+    quantized = onnx.load(target)
+    del quantized.metadata_props[:]
+    quantized.metadata_props.extend(source_model.metadata_props)
+    onnx.save(quantized, target)
+    return target
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export KTP/KK detection models")
+    parser.add_argument("--format", choices=[fmt for fmt in BACKEND_SUFFIXES if fmt != 'torch'], default='onnx')
+    parser.add_argument("--option", choices=['ktp', 'kk', 'all'], default='all')
+    parser.add_argument("--model-dir", default="model_detection")
+    parser.add_argument("--imgsz", type=int, default=640)
+    args = parser.parse_args()
+
+    options = ['ktp', 'kk'] if args.option == 'all' else [args.option]
+    for option in options:
+        path = export(option, args.format, args.model_dir, args.imgsz)
+        print(f"{option}: {path}")
+
+    print(f"Set DETECTION_BACKEND={args.format} to serve the exported models.")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,9 +1,26 @@
 # backend/server/main.py
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 import os
 
-app = FastAPI(title="KAI Assistant Backend (Face + RAG)")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    from rag.core import embeddings, executor, http_client, index_manager
+    # client HTTP bersama untuk semua panggilan LLM (pool keep-alive, HTTP/2)
+    await http_client.start()
+    # muat encoder sekali di latar belakang agar chat pertama tidak menunggu load model
+    if embeddings.EMBEDDING_WARMUP:
+        embeddings.warm_up(background=True)
+    # pantau manifest.json; versi index baru dimuat di latar lalu ditukar atomik
+    index_manager.start_watcher()
+    yield
+    await http_client.close()
+    executor.shutdown()
+
+app = FastAPI(title="KAI Assistant Backend (Face + RAG)", lifespan=lifespan)
 
 # CORS
 origins = [
@@ -22,6 +39,12 @@ app.add_middleware(
 from rag.routers.openrouter_proxy import router as or_router
 app.include_router(or_router, prefix="")  # -> POST /v1/chat/completions
 
+from rag.routers.index import router as index_router
+app.include_router(index_router, prefix="/rag")  # -> GET /rag/index/status, POST /rag/index/reload
+
+from rag.routers.ingest import router as ingest_router
+app.include_router(ingest_router, prefix="/rag")  # -> POST /rag/ingest (ALLOW_INGEST_ENDPOINT=true)
+
 # (opsional) jika ada /rag/chat
 try:
     from rag.routers.chat import router as rag_chat
@@ -29,9 +52,26 @@ try:
 except Exception:
     pass
 
+from rag.core.executor import RetrievalBusy, RETRIEVAL_QUEUE_TIMEOUT
+
+@app.exception_handler(RetrievalBusy)
+async def retrieval_busy(request: Request, exc: RetrievalBusy):
+    # antrian retrieval penuh: tolak cepat daripada menumpuk request
+    return JSONResponse(
+        status_code=503,
+        content={"error": str(exc)},
+        headers={"Retry-After": str(max(1, int(RETRIEVAL_QUEUE_TIMEOUT)))},
+    )
+
 @app.get("/healthz")
-def healthz():
-    return {"status": "ok"}
+async def healthz():
+    from rag.core import executor, query_cache, response_cache
+    from rag.core.memory import memory
+    memory_stats = await run_in_threadpool(memory.get_stats)   # sqlite/redis: I/O blocking
+    return {
+        "status": "ok", "query_cache": query_cache.get_stats(), "retrieval": executor.get_stats(),
+        "memory": memory_stats, "response_cache": response_cache.get_stats(),
+    }
 
 @app.get("/")
 def root():
@@ -40,6 +80,7 @@ def root():
         "endpoints": {
             "openrouter_proxy": "POST /v1/chat/completions",
             "rag_chat": "POST /rag/chat (jika diaktifkan)",
+            "rag_index": "GET /rag/index/status, POST /rag/index/reload",
             "docs": "/docs",
             "health": "/healthz",
         },